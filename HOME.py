@@ -1,4 +1,5 @@
 import streamlit as st
+from inference.warmup import start_warmup
 
 # Streamlit page configuration
 st.set_page_config(page_title="Medical Diagnosis App", page_icon="🏥", layout="wide")
@@ -59,3 +60,6 @@ st.markdown("""
     }
     </style>
     """, unsafe_allow_html=True)
+
+# Load the diagnosis models in the background now that the landing page has rendered
+start_warmup()
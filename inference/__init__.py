@@ -0,0 +1 @@
+"""Shared inference helpers used by the Streamlit pages."""
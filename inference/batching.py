@@ -0,0 +1,204 @@
+"""Dynamic micro-batching of concurrent prediction requests.
+
+Each model gets one queue and one worker thread. Requests that arrive close
+together are merged into a single vectorized call, and each caller gets its
+own result back through a `concurrent.futures.Future`.
+"""
+import collections
+import importlib
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+# Number of recent request latencies used to estimate p99
+LATENCY_WINDOW = 1000
+
+
+class MicroBatcher:
+    """Merge concurrent single-item requests into batched calls.
+
+    `predict_batch` receives a list of items and must return a list of results
+    of the same length. A batch is dispatched as soon as it holds
+    `max_batch_size` items or the oldest item has waited `max_wait_ms`. If a
+    batched call raises, its items are retried one at a time, so only the
+    requests that fail on their own get the exception. When a
+    `latency_budget_ms` is set the wait is shortened while the observed p99
+    latency is over budget, and relaxed back towards `max_wait_ms` once it is
+    comfortably under it.
+    """
+
+    def __init__(self, predict_batch, max_batch_size=32, max_wait_ms=5.0, latency_budget_ms=None, name=None):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.latency_budget_ms = latency_budget_ms
+        self.name = name or getattr(predict_batch, "__name__", "batcher")
+        self._wait_ms = max_wait_ms
+        self._queue = queue.Queue()
+        self._latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._worker = threading.Thread(target=self._run, name=f"microbatch-{self.name}", daemon=True)
+        self._worker.start()
+
+    def submit(self, item):
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def predict(self, item, timeout=None):
+        return self.submit(item).result(timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = batch[0][2] + self._wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _call(self, items):
+        results = self.predict_batch(items)
+        if len(results) != len(items):
+            raise RuntimeError(f"{self.name} returned {len(results)} results for {len(items)} items")
+        return results
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._process(batch)
+            except Exception as error:
+                # Nothing may kill the worker: every later predict() would block forever
+                logger.exception("Micro-batch bookkeeping failed in %s", self.name)
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(error)
+
+    def _process(self, batch):
+        items = [item for item, _, _ in batch]
+        try:
+            outcomes = [(True, result) for result in self._call(items)]
+        except Exception as error:
+            if len(items) == 1:
+                logger.exception("Request failed in %s", self.name)
+                outcomes = [(False, error)]
+            else:
+                # One bad request must not fail the others merged with it: score each on its own
+                logger.warning("Batch of %d failed in %s (%s); retrying items one by one", len(items), self.name,
+                               error)
+                outcomes = [self._call_one(item) for item in items]
+        finished = time.perf_counter()
+        for (_, future, submitted), (ok, value) in zip(batch, outcomes):
+            if ok:
+                future.set_result(value)
+                self._latencies.append((finished - submitted) * 1000.0)
+            else:
+                future.set_exception(value)
+        with self._stats_lock:
+            self._batches += 1
+            self._items += len(items)
+        self._adapt_wait()
+
+    def _call_one(self, item):
+        try:
+            return True, self._call([item])[0]
+        except Exception as error:
+            return False, error
+
+    def _p99(self):
+        # Copied first: the worker thread appends while stats() reads from another thread
+        latencies = sorted(list(self._latencies))
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+
+    def _adapt_wait(self):
+        if self.latency_budget_ms is None or self._batches % 16:
+            return
+        p99 = self._p99()
+        if p99 is None:
+            # Every request so far failed: no latencies to adapt to
+            return
+        if p99 > self.latency_budget_ms:
+            self._wait_ms = self._wait_ms / 2
+        elif p99 < self.latency_budget_ms / 2:
+            self._wait_ms = min(self.max_wait_ms, max(self._wait_ms * 2, 0.1))
+
+    def stats(self):
+        with self._stats_lock:
+            batches, items = self._batches, self._items
+        return {
+            "model": self.name,
+            "batches": batches,
+            "items": items,
+            "mean_batch_size": items / batches if batches else None,
+            "current_wait_ms": self._wait_ms,
+            "p99_latency_ms": self._p99(),
+            "queued": self._queue.qsize(),
+        }
+
+
+def _predict_xray_batch(images):
+    from inference import xray
+
+    results = xray.predict_images([(str(index), data) for index, data in enumerate(images)], batch_size=xray.BATCH_SIZE)
+    return sorted(results, key=lambda result: int(result["file"]))
+
+
+def _lazy(path):
+    # Import the model module on the first batch rather than when pages import this module
+    module_name, function_name = path.split(":")
+
+    def predict_batch(items):
+        return getattr(importlib.import_module(module_name), function_name)(items)
+
+    predict_batch.__name__ = function_name
+    return predict_batch
+
+
+# Default settings per model: (predict_batch, max_batch_size, max_wait_ms, latency_budget_ms)
+BATCHER_SETTINGS = {
+    "cancer": (_lazy("inference.cancer:predict_records"), 256, 2.0, 50.0),
+    "stroke": (_lazy("inference.stroke:predict_records"), 256, 2.0, 50.0),
+    "heart": (_lazy("inference.heart:predict_records"), 256, 2.0, 50.0),
+    "xray": (_predict_xray_batch, 32, 10.0, 500.0),
+}
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def configure(name, max_batch_size=None, max_wait_ms=None, latency_budget_ms=None):
+    """Override the defaults for a model before its batcher is first used."""
+    predict_batch, batch_size, wait_ms, budget_ms = BATCHER_SETTINGS[name]
+    BATCHER_SETTINGS[name] = (
+        predict_batch,
+        batch_size if max_batch_size is None else max_batch_size,
+        wait_ms if max_wait_ms is None else max_wait_ms,
+        budget_ms if latency_budget_ms is None else latency_budget_ms,
+    )
+
+
+def get_batcher(name):
+    batcher = _batchers.get(name)
+    if batcher is None:
+        with _batchers_lock:
+            batcher = _batchers.get(name)
+            if batcher is None:
+                predict_batch, batch_size, wait_ms, budget_ms = BATCHER_SETTINGS[name]
+                batcher = MicroBatcher(predict_batch, batch_size, wait_ms, budget_ms, name=name)
+                _batchers[name] = batcher
+    return batcher
+
+
+def batcher_stats():
+    return [batcher.stats() for batcher in _batchers.values()]
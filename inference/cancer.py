@@ -0,0 +1,56 @@
+"""Breast cancer scoring with the SVC and its scaler.
+
+When the NumPy export of the model exists (`python -m inference.svm_engine`)
+it is used instead of the pickled scikit-learn objects.
+"""
+import os
+
+from inference.encoders import ColumnEncoder, records_to_columns
+from inference.registry import artifact_path, get_model
+from inference.svm_engine import ENGINE_FILE
+
+# Features kept after the correlation analysis, in the order the scaler was fitted on
+FEATURES = [
+    "mean texture", "mean perimeter", "mean smoothness", "mean concavity", "mean symmetry",
+    "perimeter error", "compactness error", "concavity error", "concave points error",
+    "worst texture", "worst perimeter", "worst smoothness", "worst compactness",
+    "worst concavity", "worst concave points", "worst symmetry", "worst fractal dimension",
+]
+
+# Target encoding of load_breast_cancer
+LABELS = {0: "Malignant", 1: "Benign"}
+
+USE_ENGINE = os.path.exists(artifact_path(ENGINE_FILE))
+
+
+def model_names():
+    return ["svm_cancer_engine"] if USE_ENGINE else ["svm_cancer", "cancer_scaler"]
+
+
+def load():
+    for name in model_names():
+        get_model(name)
+
+
+def predict_frame(frame):
+    """Return (predictions, decision function values) for every row of `frame`.
+
+    `frame` is a DataFrame or a mapping of column name to values.
+    """
+    if USE_ENGINE:
+        engine = get_model("svm_cancer_engine")
+        scores = engine.decision_function(ColumnEncoder(engine.feature_names).transform(frame))
+        return engine.classes[(scores > 0).astype(int)], scores
+    model = get_model("svm_cancer")
+    scaler = get_model("cancer_scaler")
+    # The scaler was fitted on a bare array, so it takes the matrix directly
+    scaled = scaler.transform(ColumnEncoder(FEATURES).transform(frame))
+    return model.predict(scaled), model.decision_function(scaled)
+
+
+def predict_records(records):
+    predictions, scores = predict_frame(records_to_columns(records, FEATURES))
+    return [
+        {"prediction": int(prediction), "label": LABELS[int(prediction)], "decision_function": float(score)}
+        for prediction, score in zip(predictions, scores)
+    ]
@@ -0,0 +1,181 @@
+"""Dict-to-NumPy encoders that bypass pandas and the fitted preprocessors.
+
+A prediction request is a handful of dicts. Building a DataFrame from them
+and dispatching through a `ColumnTransformer` costs far more than the model
+itself, so the models are fed by these encoders instead:
+
+* `ColumnEncoder` lays columns out in a fixed feature order (the cancer and
+  heart models take their inputs as-is).
+* `ColumnTransformerEncoder` is compiled from a fitted `ColumnTransformer` of
+  one-hot and passthrough parts (the stroke pipeline) into per-column lookup
+  tables, and produces exactly what `transform` would.
+
+Both accept a DataFrame, a mapping of column name to values, or, through
+`records_to_columns`, a list of dicts or a NumPy record array. Check them
+against scikit-learn from the repository root:
+
+    python -m inference.encoders       # parity and timings
+    python -m pytest tests             # parity, as a test
+"""
+import numpy as np
+
+from inference.registry import artifact_path
+
+
+def records_to_columns(records, names):
+    """Column mapping for a list of dicts, a single dict or a NumPy record array."""
+    if isinstance(records, dict):
+        records = [records]
+    if isinstance(records, np.ndarray) and records.dtype.names:
+        return {name: records[name] for name in names}
+    return {name: [record[name] for record in records] for name in names}
+
+
+def take_rows(columns, rows):
+    """Subset of a DataFrame or column mapping at the integer positions `rows`."""
+    if hasattr(columns, "iloc"):
+        return columns.iloc[rows]
+    return {name: np.asarray(values, dtype=object)[rows] for name, values in columns.items()}
+
+
+def _n_rows(columns, names):
+    return len(columns[names[0]]) if names else 0
+
+
+class ColumnEncoder:
+    """Stack named columns into a matrix in `features` order."""
+
+    def __init__(self, features, dtype=np.float64):
+        self.features = list(features)
+        self.dtype = dtype
+
+    def transform(self, columns):
+        out = np.empty((_n_rows(columns, self.features), len(self.features)), dtype=self.dtype)
+        for position, name in enumerate(self.features):
+            out[:, position] = np.asarray(columns[name], dtype=self.dtype)
+        return out
+
+    def transform_records(self, records):
+        return self.transform(records_to_columns(records, self.features))
+
+
+class ColumnTransformerEncoder:
+    """Reimplementation of a fitted ColumnTransformer of one-hot and passthrough parts.
+
+    `categorical` holds (input column, {category: output position}) pairs and
+    `passthrough` holds (input column, output position) pairs. Values missing
+    from a one-hot table leave its block at zero, like `handle_unknown="ignore"`.
+    """
+
+    def __init__(self, categorical, passthrough, n_outputs, feature_names=None, dtype=np.float64):
+        self.categorical = categorical
+        self.passthrough = passthrough
+        self.n_outputs = n_outputs
+        self.feature_names = feature_names
+        self.dtype = dtype
+        self.inputs = list(dict.fromkeys([name for name, _ in categorical] + [name for name, _ in passthrough]))
+
+    @classmethod
+    def from_column_transformer(cls, transformer, dtype=np.float64):
+        from sklearn.preprocessing import OneHotEncoder
+
+        input_names = list(transformer.feature_names_in_)
+        categorical, passthrough = [], []
+        position = 0
+        for name, part, columns in transformer.transformers_:
+            if part == "drop" or (hasattr(columns, "__len__") and len(columns) == 0):
+                continue
+            columns = [input_names[column] if isinstance(column, (int, np.integer)) else column for column in columns]
+            if part == "passthrough":
+                for column in columns:
+                    passthrough.append((column, position))
+                    position += 1
+            elif isinstance(part, OneHotEncoder):
+                if getattr(part, "drop_idx_", None) is not None or getattr(part, "_infrequent_enabled", False):
+                    raise ValueError(f"Transformer {name!r}: dropped or infrequent categories are not supported")
+                if part.handle_unknown != "ignore":
+                    raise ValueError(f"Transformer {name!r}: only handle_unknown='ignore' is supported")
+                for column, categories in zip(columns, part.categories_):
+                    categorical.append((column, {category: position + index for index, category in enumerate(categories)}))
+                    position += len(categories)
+            else:
+                raise ValueError(f"Transformer {name!r}: unsupported step {type(part).__name__}")
+        return cls(categorical, passthrough, position, list(transformer.get_feature_names_out()), dtype)
+
+    def transform(self, columns):
+        out = np.zeros((_n_rows(columns, self.inputs), self.n_outputs), dtype=self.dtype)
+        rows = np.arange(out.shape[0])
+        for name, table in self.categorical:
+            positions = np.array([table.get(value, -1) for value in np.asarray(columns[name], dtype=object).tolist()],
+                                 dtype=np.int64)
+            known = positions >= 0
+            out[rows[known], positions[known]] = 1.0
+        for name, position in self.passthrough:
+            out[:, position] = np.asarray(columns[name], dtype=self.dtype)
+        return out
+
+    def transform_records(self, records):
+        return self.transform(records_to_columns(records, self.inputs))
+
+
+def verify(n_samples=5000, seed=0):
+    """Compare every encoder with the DataFrame path it replaces."""
+    import pandas as pd
+    from joblib import load
+
+    from inference import cancer, heart
+    from inference.forest_engine import random_stroke_records
+
+    rng = np.random.default_rng(seed)
+    preprocessing = load(artifact_path("preprocessing.joblib"))
+    stroke_records = random_stroke_records(preprocessing, n_samples, seed)
+    # Values the encoder was not fitted on, as the Streamlit page sends them
+    stroke_records.loc[rng.random(n_samples) < 0.2, "work_type"] = "Children"
+    stroke_records.loc[rng.random(n_samples) < 0.2, "gender"] = "Other"
+    stroke_encoder = ColumnTransformerEncoder.from_column_transformer(preprocessing)
+
+    numeric = {
+        "cancer": (cancer.FEATURES, pd.DataFrame(rng.uniform(0, 200, (n_samples, len(cancer.FEATURES))),
+                                                  columns=cancer.FEATURES)),
+        "heart": (heart.FEATURES, pd.DataFrame(rng.integers(0, 200, (n_samples, len(heart.FEATURES))),
+                                                columns=heart.FEATURES)),
+    }
+    report = {
+        "stroke": bool(np.array_equal(
+            stroke_encoder.transform_records(stroke_records.to_dict("records")),
+            preprocessing.transform(stroke_records),
+        ) and stroke_encoder.feature_names == list(preprocessing.get_feature_names_out())),
+    }
+    for name, (features, frame) in numeric.items():
+        report[name] = bool(np.array_equal(
+            ColumnEncoder(features).transform_records(frame.to_dict("records")),
+            frame[features].to_numpy(dtype=np.float64),
+        ))
+    return report
+
+
+def main():
+    import timeit
+
+    import pandas as pd
+    from joblib import load
+
+    report = verify()
+    for name, identical in report.items():
+        print(f"{name}: {'identical' if identical else 'MISMATCH'}")
+
+    preprocessing = load(artifact_path("preprocessing.joblib"))
+    encoder = ColumnTransformerEncoder.from_column_transformer(preprocessing)
+    record = {"gender": "Male", "age": 67, "hypertension": 0, "heart_disease": 1, "ever_married": "Yes",
+              "work_type": "Private", "Residence_type": "Urban", "avg_glucose_level": 228.69,
+              "smoking_status": "formerly smoked"}
+    runs = 2000
+    sklearn_us = timeit.timeit(lambda: preprocessing.transform(pd.DataFrame([record])), number=runs // 10) / (runs // 10) * 1e6
+    encoder_us = timeit.timeit(lambda: encoder.transform_records([record]), number=runs) / runs * 1e6
+    print(f"One stroke record: ColumnTransformer {sklearn_us:.0f} us, encoder {encoder_us:.0f} us")
+    if not all(report.values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""Array-backed flat tree ensemble for the stroke random forest.
+
+`convert_forest` packs every tree of the fitted RandomForestClassifier into
+one set of contiguous arrays (feature, threshold, left, right, value) and
+saves them as `.npy` files next to a small JSON manifest. `ForestEngine`
+memory-maps those files, so worker processes share one copy through the page
+cache. It scores a whole batch level by level across all trees at once.
+Probabilities match `predict_proba` exactly: inputs are compared in float32
+like scikit-learn, and tree outputs are summed in the same order.
+
+Convert and verify from the repository root:
+
+    python -m inference.forest_engine --model pages/rf_model.sav
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from inference.registry import artifact_path
+
+ENGINE_DIR = "rf_stroke_forest"
+ARRAYS = ("feature", "threshold", "left", "right", "value", "roots")
+# Rows traversed together; bounds the (rows x trees) node index matrix
+BLOCK_SIZE = 2048
+
+
+def convert_forest(model, directory):
+    """Write the flat arrays of a fitted random forest to `directory`."""
+    model = getattr(model, "best_estimator_", model)
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    counts = [tree.node_count for tree in trees]
+    offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    n_nodes = int(sum(counts))
+
+    feature = np.zeros(n_nodes, dtype=np.int32)
+    threshold = np.zeros(n_nodes, dtype=np.float64)
+    left = np.zeros(n_nodes, dtype=np.int32)
+    right = np.zeros(n_nodes, dtype=np.int32)
+    value = np.zeros((n_nodes, len(model.classes_)), dtype=np.float64)
+    for tree, offset, count in zip(trees, offsets, counts):
+        nodes = np.arange(offset, offset + count)
+        is_leaf = tree.children_left == -1
+        # Leaves point at themselves so every row can take the same number of steps
+        feature[nodes] = np.where(is_leaf, 0, tree.feature)
+        threshold[nodes] = tree.threshold
+        left[nodes] = np.where(is_leaf, nodes, tree.children_left + offset)
+        right[nodes] = np.where(is_leaf, nodes, tree.children_right + offset)
+        # Normalised exactly like DecisionTreeClassifier.predict_proba
+        counts_per_class = tree.value[:, 0, :]
+        normalizer = counts_per_class.sum(axis=1)
+        normalizer[normalizer == 0.0] = 1.0
+        value[nodes] = counts_per_class / normalizer[:, np.newaxis]
+
+    os.makedirs(directory, exist_ok=True)
+    arrays = {"feature": feature, "threshold": threshold, "left": left, "right": right,
+              "value": value, "roots": offsets.astype(np.int32)}
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f"{name}.npy"), array)
+    manifest = {
+        "n_trees": len(trees),
+        "n_features": int(model.n_features_in_),
+        "max_depth": int(max(tree.max_depth for tree in trees)),
+        "classes": np.asarray(model.classes_).tolist(),
+    }
+    with open(os.path.join(directory, "manifest.json"), "w") as file:
+        json.dump(manifest, file, indent=2)
+
+
+class ForestEngine:
+    """Vectorized traversal of a flat tree ensemble."""
+
+    def __init__(self, feature, threshold, left, right, value, roots, n_features, max_depth, classes):
+        # Plain ndarray views; fancy indexing on np.memmap objects is noticeably slower
+        self.feature = np.asarray(feature)
+        self.threshold = np.asarray(threshold)
+        self.value = np.asarray(value)
+        self.roots = np.asarray(roots)
+        # children[node] == (left, right), so one gather picks the next node
+        self.children = np.stack([np.asarray(left), np.asarray(right)], axis=1).ravel()
+        self.is_leaf = np.asarray(left) == np.arange(len(self.feature))
+        self.n_features = n_features
+        self.max_depth = max_depth
+        self.classes_ = np.asarray(classes)
+
+    @classmethod
+    def load(cls, directory=None, mmap=True):
+        directory = directory or artifact_path(ENGINE_DIR)
+        with open(os.path.join(directory, "manifest.json")) as file:
+            manifest = json.load(file)
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r" if mmap else None)
+                  for name in ARRAYS}
+        return cls(n_features=manifest["n_features"], max_depth=manifest["max_depth"],
+                   classes=manifest["classes"], **arrays)
+
+    def apply(self, X):
+        """Leaf node index of every row in every tree, shape (rows, trees)."""
+        X = np.ascontiguousarray(X)
+        nodes = np.repeat(self.roots[np.newaxis, :], X.shape[0], axis=0).ravel()
+        row_offsets = np.repeat(np.arange(X.shape[0]) * X.shape[1], len(self.roots))
+        flat_X = X.ravel()
+        # Only rows that have not reached a leaf yet are advanced at each level
+        active = np.flatnonzero(~self.is_leaf[nodes])
+        for _ in range(self.max_depth):
+            if active.size == 0:
+                break
+            current = nodes[active]
+            go_right = flat_X[row_offsets[active] + self.feature[current]] > self.threshold[current]
+            nodes[active] = self.children[2 * current + go_right]
+            active = active[~self.is_leaf[nodes[active]]]
+        return nodes.reshape(X.shape[0], len(self.roots))
+
+    def _proba_block(self, X):
+        leaves = self.apply(X)
+        proba = np.zeros((X.shape[0], self.value.shape[1]), dtype=np.float64)
+        # Summed tree by tree, in the same order as RandomForestClassifier
+        for tree in range(leaves.shape[1]):
+            proba += self.value[leaves[:, tree]]
+        proba /= leaves.shape[1]
+        return proba
+
+    def predict_proba(self, X, block_size=BLOCK_SIZE):
+        # scikit-learn trees compare float32 copies of the input
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {X.shape[1]}")
+        # NaN compares False against every threshold and would silently go left; scikit-learn refuses it, and
+        # so do we (after the float32 cast, so values too large for float32 are caught as infinity too)
+        if not np.isfinite(X).all():
+            raise ValueError("Input X contains NaN or infinity, or a value too large for dtype('float32').")
+        out = np.empty((X.shape[0], self.value.shape[1]), dtype=np.float64)
+        for start in range(0, X.shape[0], block_size):
+            out[start:start + block_size] = self._proba_block(X[start:start + block_size])
+        return out
+
+    def predict(self, X, block_size=BLOCK_SIZE):
+        return self.classes_.take(np.argmax(self.predict_proba(X, block_size), axis=1), axis=0)
+
+
+def random_stroke_records(preprocessing, n_samples, seed=0):
+    """Random raw stroke records drawn from the fitted categories and plausible numeric ranges."""
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    encoder = preprocessing.named_transformers_["cat"]
+    columns = {name: rng.choice(categories, n_samples)
+               for name, categories in zip(preprocessing.transformers_[0][2], encoder.categories_)}
+    columns["age"] = rng.integers(0, 101, n_samples).astype(float)
+    columns["hypertension"] = rng.integers(0, 2, n_samples)
+    columns["heart_disease"] = rng.integers(0, 2, n_samples)
+    columns["avg_glucose_level"] = np.round(rng.uniform(50.0, 300.0, n_samples), 2)
+    return pd.DataFrame(columns)[list(preprocessing.feature_names_in_)]
+
+
+def verify(engine, model, preprocessing, n_samples=20000, seed=0):
+    """Compare the engine with `predict_proba` of the scikit-learn forest."""
+    X = preprocessing.transform(random_stroke_records(preprocessing, n_samples, seed))
+    expected = model.predict_proba(X)
+    actual = engine.predict_proba(X)
+    return {
+        "samples": n_samples,
+        "identical_probabilities": bool(np.array_equal(expected, actual)),
+        "max_abs_proba_diff": float(np.max(np.abs(expected - actual))),
+        "prediction_mismatches": int(np.sum(model.predict(X) != engine.predict(X))),
+    }
+
+
+def main(argv=None):
+    from joblib import load
+
+    parser = argparse.ArgumentParser(description="Compile the stroke random forest into flat arrays.")
+    parser.add_argument("--model", default=artifact_path("rf_model.sav"))
+    parser.add_argument("--preprocessing", default=artifact_path("preprocessing.joblib"))
+    parser.add_argument("--out", default=artifact_path(ENGINE_DIR))
+    args = parser.parse_args(argv)
+
+    model = load(args.model)
+    convert_forest(model, args.out)
+    report = verify(ForestEngine.load(args.out), model, load(args.preprocessing))
+    print(f"Wrote {args.out}")
+    print(f"Identical probabilities: {report['identical_probabilities']} "
+          f"(max |difference| {report['max_abs_proba_diff']:.3e} over {report['samples']} rows)")
+    print(f"Prediction mismatches: {report['prediction_mismatches']}")
+    if not report["identical_probabilities"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
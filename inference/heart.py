@@ -0,0 +1,104 @@
+"""Heart disease scoring with the XGBoost model.
+
+When the native Booster export exists (`python -m inference.xgb_engine`) it
+is used instead of the pickled search object.
+"""
+import functools
+import os
+
+import numpy as np
+
+from inference.encoders import ColumnEncoder, records_to_columns
+from inference.registry import artifact_path, get_model
+from inference.xgb_engine import BOOSTER_FILE
+
+# Columns after pd.get_dummies(..., drop_first=True) in the training notebook
+FEATURES = [
+    "Age", "Sex", "BP", "Cholesterol", "FBS over 120", "EKG results", "Max HR",
+    "Exercise angina", "ST depression", "Slope of ST", "Number of vessels fluro",
+    "Thallium", "Chest pain type_2", "Chest pain type_3", "Chest pain type_4",
+]
+
+# Slider ranges swept by the what-if risk curves: (first, last, step)
+SWEEPS = {
+    "Age": (21, 77, 1),
+    "BP": (94, 200, 1),
+    "Cholesterol": (126, 564, 1),
+    "Max HR": (71, 202, 1),
+    "ST depression": (0.0, 6.2, 0.1),
+}
+# Distinct input vectors whose curves are kept
+CURVE_CACHE_SIZE = 1024
+
+USE_ENGINE = os.path.exists(artifact_path(BOOSTER_FILE))
+
+
+def model_names():
+    return ["xgb_heart_booster" if USE_ENGINE else "xgb_heart"]
+
+
+def load():
+    for name in model_names():
+        get_model(name)
+
+
+def predict_frame(frame):
+    """Return (predictions, heart disease probabilities) for every row of `frame`.
+
+    `frame` is a DataFrame or a mapping of column name to values.
+    """
+    if USE_ENGINE:
+        booster = get_model("xgb_heart_booster")
+        proba = booster.predict_proba(ColumnEncoder(booster.features, np.float32).transform(frame))
+        return (proba > booster.threshold).astype(int), proba
+    import pandas as pd
+
+    model = get_model("xgb_heart")
+    # The pickled classifier validates feature names, so it still gets a DataFrame
+    proba = model.predict_proba(pd.DataFrame(ColumnEncoder(FEATURES).transform(frame), columns=FEATURES))[:, 1]
+    # XGBClassifier.predict thresholds the binary probability at 0.5
+    return (proba > 0.5).astype(int), proba
+
+
+def sweep_values(feature):
+    first, last, step = SWEEPS[feature]
+    return np.round(np.arange(first, last + step / 2, step), 6)
+
+
+def risk_curves(record):
+    """Predicted probability as each SWEEPS feature moves across its range.
+
+    All other inputs stay at their values in `record`. Every curve comes from
+    one batched call over the stacked grids, and results are memoized per
+    input vector. Returns {feature: (values, probabilities)} of read-only arrays.
+    """
+    return _risk_curves(tuple(float(record[name]) for name in FEATURES))
+
+
+@functools.lru_cache(maxsize=CURVE_CACHE_SIZE)
+def _risk_curves(values):
+    sweeps = {feature: sweep_values(feature) for feature in SWEEPS}
+    grid = np.tile(np.asarray(values, dtype=np.float64), (sum(len(points) for points in sweeps.values()), 1))
+    start = 0
+    for feature, points in sweeps.items():
+        grid[start:start + len(points), FEATURES.index(feature)] = points
+        start += len(points)
+    _, proba = predict_frame({name: grid[:, position] for position, name in enumerate(FEATURES)})
+    proba = np.asarray(proba)
+    curves = {}
+    start = 0
+    for feature, points in sweeps.items():
+        curve = proba[start:start + len(points)].copy()
+        points.setflags(write=False)
+        curve.setflags(write=False)
+        curves[feature] = (points, curve)
+        start += len(points)
+    return curves
+
+
+def predict_records(records):
+    predictions, proba = predict_frame(records_to_columns(records, FEATURES))
+    return [
+        {"prediction": int(prediction), "probability": float(probability)}
+        for prediction, probability in zip(predictions, proba)
+    ]
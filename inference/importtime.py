@@ -0,0 +1,83 @@
+"""Import-time budget report for the Streamlit app.
+
+For every app script (HOME.py and pages/*.py) the top-level import statements
+are read from the source and run in a fresh interpreter with `python -X
+importtime`. The report shows the total import cost per script and the most
+expensive top-level packages, and flags heavy frameworks that should only be
+imported lazily.
+
+    python -m inference.importtime                 # report
+    python -m inference.importtime --budget-ms 800 # exit 1 when over budget
+"""
+import argparse
+import ast
+import collections
+import glob
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Frameworks that must never be imported just to render a page
+HEAVY_PACKAGES = ("tensorflow", "keras", "xgboost", "sklearn", "skopt", "imblearn", "joblib", "pandas")
+
+
+def app_scripts():
+    return [os.path.join(ROOT, "HOME.py")] + sorted(glob.glob(os.path.join(ROOT, "pages", "*.py")))
+
+
+def script_imports(path):
+    """The top-level import statements of a script, as source lines."""
+    with open(path, encoding="utf-8") as file:
+        tree = ast.parse(file.read(), path)
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def measure(statements):
+    """Run the imports in a fresh interpreter; returns (total_us, {package: self_us})."""
+    code = "\n".join(statements) or "pass"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True, cwd=ROOT, check=True)
+    per_package = collections.Counter()
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        per_package[package] += int(self_us)
+        # Unindented entries are the ones imported directly by the -c code
+        if not name.startswith("  "):
+            total += int(cumulative_us)
+    return total, per_package
+
+
+def report(budget_ms=None, top=5):
+    over_budget = []
+    for path in app_scripts():
+        name = os.path.relpath(path, ROOT)
+        total_us, per_package = measure(script_imports(path))
+        heavy = sorted(package for package in per_package if package in HEAVY_PACKAGES)
+        print(f"{name}: {total_us / 1000:.0f} ms")
+        for package, self_us in per_package.most_common(top):
+            print(f"    {package:<24} {self_us / 1000:8.1f} ms")
+        if heavy:
+            print(f"    heavy imports at page load: {', '.join(heavy)}")
+        if (budget_ms is not None and total_us / 1000 > budget_ms) or heavy:
+            over_budget.append(name)
+    return over_budget
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report the import cost of each app script.")
+    parser.add_argument("--budget-ms", type=float, help="fail when a script's imports take longer than this")
+    parser.add_argument("--top", type=int, default=5, help="packages listed per script")
+    args = parser.parse_args(argv)
+    over_budget = report(args.budget_ms, args.top)
+    if over_budget:
+        print(f"Over budget: {', '.join(over_budget)}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
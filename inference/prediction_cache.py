@@ -0,0 +1,159 @@
+"""Bounded LRU cache of predictions keyed by input content.
+
+Entries are keyed by a hash of the raw input bytes together with a model
+version string, so a new or retrained model never serves stale results. The
+memory tier is an `OrderedDict` LRU; an optional directory adds a second tier
+that survives restarts and is shared by every process pointing at it.
+"""
+import collections
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def content_key(data, version):
+    """Hex digest identifying `data` as scored by model `version`."""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(version.encode())
+    digest.update(b"\0")
+    digest.update(data)
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """Thread-safe LRU of JSON-serializable predictions.
+
+    `max_entries` bounds the memory tier. When `directory` is given, entries
+    are also written there as small JSON files (at most `max_disk_entries`,
+    oldest removed first) and memory misses fall back to them.
+    """
+
+    def __init__(self, max_entries=256, directory=None, max_disk_entries=10000, name="cache"):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_disk_entries = max_disk_entries
+        self.name = name
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._disk_count = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._disk_count = sum(1 for _ in self._disk_files())
+
+    def _disk_path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def _disk_files(self):
+        for root, _, files in os.walk(self.directory):
+            for file_name in files:
+                if file_name.endswith(".json"):
+                    yield os.path.join(root, file_name)
+
+    def _read_disk(self, key):
+        try:
+            with open(self._disk_path(key)) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key, value):
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        existed = os.path.exists(path)
+        # Write then rename so concurrent readers never see a partial file
+        descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(descriptor, "w") as file:
+            json.dump(value, file)
+        os.replace(temp_path, path)
+        if not existed:
+            with self._lock:
+                self._disk_count += 1
+                prune = self._disk_count > self.max_disk_entries
+            if prune:
+                self._prune_disk()
+
+    def _prune_disk(self):
+        # Drop the oldest files down to 90% of the limit so pruning is not paid on every write
+        files = []
+        for path in self._disk_files():
+            try:
+                files.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+        files.sort()
+        excess = len(files) - int(self.max_disk_entries * 0.9)
+        for _, path in files[:max(excess, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_count = len(files) - max(excess, 0)
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Return the cached value for `key`, or None on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return self._entries[key]
+        if self.directory:
+            value = self._read_disk(key)
+            if value is not None:
+                self._remember(key, value)
+                with self._lock:
+                    self._disk_hits += 1
+                return value
+        with self._lock:
+            self._misses += 1
+        return None
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.directory:
+            try:
+                self._write_disk(key, value)
+            except OSError:
+                logger.warning("Could not write %s entry to %s", self.name, self.directory, exc_info=True)
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            hits, disk_hits, misses = self._hits, self._disk_hits, self._misses
+            size = len(self._entries)
+        lookups = hits + disk_hits + misses
+        return {
+            "cache": self.name,
+            "entries": size,
+            "max_entries": self.max_entries,
+            "hits": hits,
+            "disk_hits": disk_hits,
+            "misses": misses,
+            "hit_rate": (hits + disk_hits) / lookups if lookups else None,
+            "disk_entries": self._disk_count if self.directory else None,
+        }
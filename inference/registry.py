@@ -0,0 +1,197 @@
+"""Process-wide registry of the diagnosis models.
+
+Every page asks the registry for its model instead of deserializing the
+artifact itself. Each artifact is loaded once per process, on first use, and
+the registry keeps the load time and the memory it cost so they can be shown
+in the app.
+"""
+import logging
+import os
+import pickle
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Artifacts live next to the Streamlit pages
+PAGES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pages")
+
+
+def artifact_path(filename):
+    return os.path.join(PAGES_DIR, filename)
+
+
+def _current_rss():
+    # Resident set size in bytes, read from /proc when available
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class _Entry:
+    def __init__(self, name, loader, path):
+        self.name = name
+        self.loader = loader
+        self.path = path
+        self.lock = threading.Lock()
+        self.value = None
+        self.loaded = False
+        self.load_seconds = None
+        self.rss_delta_bytes = None
+
+
+class ModelRegistry:
+    """Lazily loads named artifacts exactly once per process."""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, loader, path=None):
+        with self._lock:
+            self._entries[name] = _Entry(name, loader, path)
+
+    def get(self, name):
+        entry = self._entries[name]
+        # Fast path once the artifact is in memory
+        if entry.loaded:
+            return entry.value
+        with entry.lock:
+            if not entry.loaded:
+                rss_before = _current_rss()
+                start = time.perf_counter()
+                entry.value = entry.loader()
+                entry.load_seconds = time.perf_counter() - start
+                entry.rss_delta_bytes = max(_current_rss() - rss_before, 0)
+                entry.loaded = True
+                logger.info("Loaded %s in %.3fs (+%.1f MB)", name, entry.load_seconds,
+                            entry.rss_delta_bytes / 2 ** 20)
+        return entry.value
+
+    def is_loaded(self, name):
+        return self._entries[name].loaded
+
+    def names(self):
+        return list(self._entries)
+
+    def path(self, name):
+        return self._entries[name].path
+
+    def stats(self):
+        """Load time and memory per registered artifact."""
+        rows = []
+        for entry in self._entries.values():
+            rows.append({
+                "model": entry.name,
+                "loaded": entry.loaded,
+                "load_seconds": entry.load_seconds,
+                "rss_delta_mb": None if entry.rss_delta_bytes is None else entry.rss_delta_bytes / 2 ** 20,
+                "path": entry.path,
+            })
+        return rows
+
+
+def _load_pickle(path):
+    with open(path, "rb") as file:
+        return pickle.load(file)
+
+
+def _load_joblib(path):
+    from joblib import load
+    return load(path)
+
+
+def _load_keras(path):
+    import tensorflow as tf
+    return tf.keras.models.load_model(path)
+
+
+def _load_svm_engine(path):
+    from inference.svm_engine import SVMEngine
+    return SVMEngine.load(path)
+
+
+def _load_forest_engine(path):
+    from inference.forest_engine import ForestEngine
+    return ForestEngine.load(path)
+
+
+def _load_stroke_index(path):
+    from inference.stroke_index import StrokeIndex
+    return StrokeIndex.load(path)
+
+
+def _load_stroke_encoder():
+    # Compiled from the fitted ColumnTransformer, so it follows whatever preprocessing.joblib holds
+    from inference.encoders import ColumnTransformerEncoder
+    return ColumnTransformerEncoder.from_column_transformer(get_model("stroke_preprocessing"))
+
+
+def _load_heart_booster(path):
+    from inference.xgb_engine import HeartBooster
+    return HeartBooster.load(path)
+
+
+def _load_tflite(path):
+    from inference.xray_tflite import TFLiteXrayModel
+    return TFLiteXrayModel(path, int(os.environ.get("XRAY_TFLITE_THREADS", 0)) or None)
+
+
+registry = ModelRegistry()
+
+# Breast cancer: SVC and the StandardScaler it was trained behind
+registry.register("svm_cancer", lambda: _load_pickle(artifact_path("SVM_cancer.sav")), artifact_path("SVM_cancer.sav"))
+registry.register("cancer_scaler", lambda: _load_pickle(artifact_path("scaler.pkl")), artifact_path("scaler.pkl"))
+# Breast cancer: NumPy export of the two above (python -m inference.svm_engine)
+registry.register("svm_cancer_engine", lambda: _load_svm_engine(artifact_path("svm_cancer_engine.npz")),
+                  artifact_path("svm_cancer_engine.npz"))
+# Stroke: random forest and its ColumnTransformer
+registry.register("rf_stroke", lambda: _load_joblib(artifact_path("rf_model.sav")), artifact_path("rf_model.sav"))
+registry.register("stroke_preprocessing", lambda: _load_joblib(artifact_path("preprocessing.joblib")),
+                  artifact_path("preprocessing.joblib"))
+# Stroke: dict-to-NumPy replacement for the ColumnTransformer above
+registry.register("stroke_encoder", _load_stroke_encoder)
+# Stroke: flat-array export of the random forest (python -m inference.forest_engine)
+registry.register("rf_stroke_forest", lambda: _load_forest_engine(artifact_path("rf_stroke_forest")),
+                  artifact_path("rf_stroke_forest"))
+# Stroke: precomputed decision regions of the forest (python -m inference.stroke_index)
+registry.register("rf_stroke_index", lambda: _load_stroke_index(artifact_path("rf_stroke_index")),
+                  artifact_path("rf_stroke_index"))
+# Heart disease: XGBoost classifier
+registry.register("xgb_heart", lambda: _load_pickle(artifact_path("xgboost_heart_disease_model.sav")),
+                  artifact_path("xgboost_heart_disease_model.sav"))
+# Heart disease: native Booster export of the model above (python -m inference.xgb_engine)
+registry.register("xgb_heart_booster", lambda: _load_heart_booster(artifact_path("xgb_heart_booster.ubj")),
+                  artifact_path("xgb_heart_booster.ubj"))
+# Pneumonia: Keras CNN
+registry.register("cnn_xray", lambda: _load_keras(artifact_path("ANN_ChestXRay_model.h5")),
+                  artifact_path("ANN_ChestXRay_model.h5"))
+# Pneumonia: compact student distilled from the CNN above (python -m training cnn-xray --student)
+registry.register("cnn_xray_student", lambda: _load_keras(artifact_path("ANN_ChestXRay_student.h5")),
+                  artifact_path("ANN_ChestXRay_student.h5"))
+# Pneumonia: quantized TFLite conversions (python -m inference.xray_tflite convert)
+registry.register("cnn_xray_int8", lambda: _load_tflite(artifact_path("ANN_ChestXRay_model_int8.tflite")),
+                  artifact_path("ANN_ChestXRay_model_int8.tflite"))
+registry.register("cnn_xray_float16", lambda: _load_tflite(artifact_path("ANN_ChestXRay_model_float16.tflite")),
+                  artifact_path("ANN_ChestXRay_model_float16.tflite"))
+
+
+def get_model(name):
+    return registry.get(name)
+
+
+def model_stats():
+    return registry.stats()
+
+
+def model_version(name):
+    """Identify the artifact behind `name` by file name, size and modification time."""
+    path = registry.path(name)
+    try:
+        info = os.stat(path)
+    except (OSError, TypeError):
+        return name
+    return f"{name}:{os.path.basename(path)}:{info.st_size}:{info.st_mtime_ns}"
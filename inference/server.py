@@ -0,0 +1,193 @@
+"""Headless HTTP inference service for the four diagnosis models.
+
+Run from the repository root:
+
+    python -m inference.server --host 127.0.0.1 --port 8000 --preload
+
+Endpoints
+    GET  /health               loaded models and their load stats
+    POST /predict/cancer       JSON record, list of records or {"records": [...]}
+    POST /predict/stroke       same as above
+    POST /predict/heart        same as above
+    POST /predict/xray         multipart/form-data with one or more image files,
+                               a zip archive part, or a raw image body
+
+Single-record and single-image requests go through the per-model
+micro-batchers, so concurrent clients share vectorized model calls. Single
+images are also looked up in the X-ray prediction cache first.
+"""
+import argparse
+import email.parser
+import email.policy
+import io
+import json
+import logging
+import zipfile
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from inference import cancer, heart, stroke, xray
+from inference.batching import batcher_stats, get_batcher
+from inference.registry import model_stats
+
+logger = logging.getLogger(__name__)
+
+TABULAR_MODELS = {"cancer": cancer, "stroke": stroke, "heart": heart}
+
+# Refuse request bodies larger than this many bytes
+MAX_BODY_BYTES = 256 * 2 ** 20
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _parse_records(body):
+    try:
+        payload = json.loads(body)
+    except ValueError as error:
+        raise BadRequest(f"Invalid JSON: {error}")
+    if isinstance(payload, dict) and "records" in payload:
+        records, single = payload["records"], False
+    elif isinstance(payload, list):
+        records, single = payload, False
+    elif isinstance(payload, dict):
+        records, single = [payload], True
+    else:
+        records = None
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        raise BadRequest("Expected a JSON object, a list of objects or {\"records\": [...]}")
+    return records, single
+
+
+def _parse_images(content_type, body):
+    """Return (name, bytes) pairs from a multipart, zip or raw image body."""
+    if content_type.startswith("multipart/form-data"):
+        header = f"Content-Type: {content_type}\r\n\r\n".encode()
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(header + body)
+        if not message.is_multipart():
+            raise BadRequest("Malformed multipart body")
+        images = []
+        for part in message.iter_parts():
+            name = part.get_filename() or part.get_param("name", header="content-disposition") or "image"
+            data = part.get_payload(decode=True) or b""
+            if name.lower().endswith(".zip"):
+                images.extend(xray.iter_zip_images(io.BytesIO(data)))
+            else:
+                images.append((name, data))
+        return images
+    if content_type in ("application/zip", "application/x-zip-compressed"):
+        return list(xray.iter_zip_images(io.BytesIO(body)))
+    if content_type.startswith("image/"):
+        return [("image", body)]
+    raise BadRequest("Send images as multipart/form-data, application/zip or image/*")
+
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    # Keep-alive so clients can reuse connections
+    protocol_version = "HTTP/1.1"
+    server_version = "MedicalDiagnosisInference/1.0"
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            # The body stays unread, so the connection cannot carry another request
+            self.close_connection = True
+            raise BadRequest("Request body too large")
+        return self.rfile.read(length)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(HTTPStatus.OK, {
+                "status": "ok",
+                "models": model_stats(),
+                "batchers": batcher_stats(),
+                "caches": [xray.cache_stats()],
+            })
+        else:
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        try:
+            body = self._read_body()
+            name = self.path.rstrip("/").rsplit("/", 1)[-1] if self.path.startswith("/predict/") else None
+            if name in TABULAR_MODELS:
+                records, single = _parse_records(body)
+                if single:
+                    payload = get_batcher(name).predict(records[0])
+                else:
+                    payload = {"predictions": TABULAR_MODELS[name].predict_records(records)}
+            elif name == "xray":
+                images = _parse_images(self.headers.get("Content-Type", ""), body)
+                if not images:
+                    raise BadRequest("No images found in request")
+                if len(images) == 1:
+                    file_name, data = images[0]
+                    predictions = [dict(xray.predict_image(data), file=file_name)]
+                else:
+                    predictions = xray.predict_images(images)
+                payload = {"predictions": predictions}
+            else:
+                self._send_json(HTTPStatus.NOT_FOUND, {"error": f"Unknown path {self.path}"})
+                return
+        except (BadRequest, KeyError, ValueError, zipfile.BadZipFile) as error:
+            self._send_json(HTTPStatus.BAD_REQUEST, {"error": str(error)})
+            return
+        except Exception:
+            logger.exception("Prediction failed for %s", self.path)
+            self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Prediction failed"})
+            return
+        self._send_json(HTTPStatus.OK, payload)
+
+
+class InferenceServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The stdlib default backlog of 5 drops connections under concurrent load
+    request_queue_size = 1024
+
+
+def make_server(host="127.0.0.1", port=8000):
+    return InferenceServer((host, port), InferenceHandler)
+
+
+def preload():
+    for module in list(TABULAR_MODELS.values()) + [xray]:
+        try:
+            module.load()
+        except (OSError, ImportError) as error:
+            logger.warning("Could not preload %s: %s", module.__name__, error)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the diagnosis models over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--preload", action="store_true", help="load every model before accepting requests")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if args.preload:
+        preload()
+    server = make_server(args.host, args.port)
+    logger.info("Serving on http://%s:%d", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Stroke risk scoring for single patients and large CSV files.
+
+When the flat-array export of the forest exists (`python -m
+inference.forest_engine`) it is used instead of the pickled search object.
+When the precomputed decision regions exist as well (`python -m
+inference.stroke_index`), records they cover skip the model entirely.
+"""
+import os
+
+import numpy as np
+
+from inference.encoders import records_to_columns, take_rows
+from inference.forest_engine import ENGINE_DIR
+from inference.registry import artifact_path, get_model
+from inference.stroke_index import INDEX_DIR
+
+# Columns the preprocessing pipeline was fitted on, in the Kaggle dataset schema
+FEATURES = ['gender', 'age', 'hypertension', 'heart_disease', 'ever_married',
+            'work_type', 'Residence_type', 'avg_glucose_level', 'smoking_status']
+
+# Rows scored per vectorized call when reading a CSV
+CHUNK_SIZE = 10000
+
+USE_ENGINE = os.path.exists(artifact_path(ENGINE_DIR))
+USE_INDEX = os.path.exists(artifact_path(INDEX_DIR))
+
+
+def model_names():
+    names = ["rf_stroke_forest" if USE_ENGINE else "rf_stroke", "stroke_preprocessing"]
+    return ["rf_stroke_index"] + names if USE_INDEX else names
+
+
+def load():
+    for name in model_names():
+        get_model(name)
+
+
+def _positive_column(model):
+    return list(model.classes_).index(1)
+
+
+def predict_frame(frame):
+    """Return (predictions, stroke probabilities) for every row of `frame`.
+
+    `frame` is a DataFrame or a mapping of column name to values.
+    """
+    if not USE_INDEX:
+        return _predict_model(frame)
+    predictions, proba, covered = get_model("rf_stroke_index").predict(frame)
+    if not covered.all():
+        # Fractional ages, missing values and the like fall back to the forest
+        rest = np.flatnonzero(~covered)
+        predictions[rest], proba[rest] = _predict_model(take_rows(frame, rest))
+    return predictions, proba
+
+
+def _predict_model(frame):
+    model = get_model("rf_stroke_forest" if USE_ENGINE else "rf_stroke")
+    processed = get_model("stroke_encoder").transform(frame)
+    proba = model.predict_proba(processed)
+    # Same rule as RandomForestClassifier.predict
+    predictions = model.classes_.take(proba.argmax(axis=1))
+    return predictions, proba[:, _positive_column(model)]
+
+
+def count_rows(csv_file):
+    # Cheap line count so progress can be reported, then rewind for parsing
+    csv_file.seek(0)
+    rows = sum(1 for _ in csv_file) - 1
+    csv_file.seek(0)
+    return max(rows, 0)
+
+
+def score_csv(csv_file, output_file, chunk_size=CHUNK_SIZE):
+    """Score a CSV chunk by chunk and append the results to `output_file`.
+
+    Only one chunk is held in memory at a time. Yields the number of rows
+    scored so far after each chunk so callers can report progress.
+    """
+    import pandas as pd
+
+    missing = None
+    scored = 0
+    for chunk in pd.read_csv(csv_file, chunksize=chunk_size):
+        if missing is None:
+            missing = [column for column in FEATURES if column not in chunk.columns]
+            if missing:
+                raise ValueError(f"CSV is missing required columns: {', '.join(missing)}")
+        predictions, proba = predict_frame(chunk)
+        chunk['stroke_prediction'] = predictions
+        chunk['stroke_probability'] = proba
+        chunk.to_csv(output_file, header=scored == 0, index=False)
+        scored += len(chunk)
+        yield scored
+
+
+def predict_records(records):
+    if USE_INDEX and len(records) == 1:
+        # A single record, as the page sends, is cheapest as a plain lookup
+        hit = get_model("rf_stroke_index").predict_record(records[0])
+        if hit is not None:
+            return [{"prediction": int(hit[0]), "probability": hit[1]}]
+    predictions, proba = predict_frame(records_to_columns(records, FEATURES))
+    return [
+        {"prediction": int(prediction), "probability": float(probability)}
+        for prediction, probability in zip(predictions, proba)
+    ]
@@ -0,0 +1,347 @@
+"""Precomputed decision regions of the stroke random forest.
+
+Every stroke input except `avg_glucose_level` is discrete: gender, integer
+age 0-100, hypertension, heart disease, marital status, work type, residence
+and smoking status. With those fixed, the forest is a step function of
+glucose. `build_index` enumerates every discrete combination and, for each
+one, stores the glucose thresholds where the probability or the prediction
+changes together with the value on every segment.
+
+A prediction is then a direct lookup of the combination (its mixed-radix code
+is a perfect hash into a table of the distinct step functions) plus a binary
+search over a handful of thresholds. Results are identical to `predict_proba`
+of the forest. Each categorical field has one extra slot for values the
+one-hot encoder does not know (the page's "Other" gender or "Children" work
+type, for example), which the encoder maps to all zeros. Records outside the index (fractional or
+out-of-range ages, missing values) are left to the forest.
+
+Build from the flat forest export and verify from the repository root:
+
+    python -m inference.stroke_index --model pages/rf_model.sav
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from inference.registry import artifact_path
+
+INDEX_DIR = "rf_stroke_index"
+ARRAYS = ("glucose", "functions", "offsets", "breaks", "proba", "prediction")
+AGES = np.arange(0, 101)
+# Discrete combinations expanded together; bounds the (combinations x glucose regions) matrices
+CHUNK_SIZE = 1024
+
+
+def _fields(preprocessing):
+    """(name, values) of every discrete input, in FEATURES order without glucose.
+
+    Categorical fields list the fitted categories followed by None, the slot
+    for any unknown value.
+    """
+    categories = dict(zip(preprocessing.transformers_[0][2], preprocessing.named_transformers_["cat"].categories_))
+    fields = []
+    for name in preprocessing.feature_names_in_:
+        if name in categories:
+            fields.append((name, [str(value) for value in categories[name]] + [None]))
+        elif name == "age":
+            fields.append((name, AGES.tolist()))
+        elif name in ("hypertension", "heart_disease"):
+            fields.append((name, [0, 1]))
+    return fields
+
+
+def _encoded_combinations(preprocessing, fields, codes):
+    """Transformed feature rows for the combinations with the given codes.
+
+    Glucose is left at zero; the builder handles it as an interval.
+    """
+    import pandas as pd
+
+    radices = [len(values) for _, values in fields]
+    digits = np.unravel_index(codes, radices)
+    columns = {}
+    for (name, values), digit in zip(fields, digits):
+        # Unknown categories are encoded through a value the encoder has never seen
+        columns[name] = [value if value is not None else "__unknown__" for value in np.asarray(values, dtype=object)[digit]]
+    columns["avg_glucose_level"] = 0.0
+    frame = pd.DataFrame(columns)[list(preprocessing.feature_names_in_)]
+    return np.asarray(preprocessing.transform(frame), dtype=np.float32)
+
+
+def _tree_leaves(engine, X, root, glucose_feature, glucose):
+    """Leaf reached on every glucose region for each row of X, in one tree.
+
+    Walks all rows down the tree at once. Splits on glucose send a row both
+    ways with its region range narrowed; other splits use the row's value.
+    Returns node indices of shape (rows, len(glucose) + 1).
+    """
+    n_regions = len(glucose) + 1
+    rows = np.arange(X.shape[0])
+    nodes = np.full(X.shape[0], root)
+    first = np.zeros(X.shape[0], dtype=np.int64)
+    last = np.full(X.shape[0], n_regions - 1, dtype=np.int64)
+    leaves = []
+    while rows.size:
+        leaf = engine.is_leaf[nodes]
+        leaves.append((rows[leaf], nodes[leaf], first[leaf], last[leaf]))
+        rows, nodes, first, last = rows[~leaf], nodes[~leaf], first[~leaf], last[~leaf]
+        feature = engine.feature[nodes]
+        threshold = engine.threshold[nodes]
+        on_glucose = feature == glucose_feature
+        go_right = X[rows, feature] > threshold
+        # Region r holds glucose values in (glucose[r - 1], glucose[r]]; a split at glucose[k] sends regions <= k left
+        split = np.searchsorted(glucose, threshold)
+        to_left = np.where(on_glucose, first <= split, ~go_right)
+        to_right = np.where(on_glucose, last > split, go_right)
+        rows = np.concatenate([rows[to_left], rows[to_right]])
+        nodes = np.concatenate([engine.children[2 * nodes[to_left]], engine.children[2 * nodes[to_right] + 1]])
+        first, last = (
+            np.concatenate([first[to_left], np.where(on_glucose, np.maximum(first, split + 1), first)[to_right]]),
+            np.concatenate([np.where(on_glucose, np.minimum(last, split), last)[to_left], last[to_right]]),
+        )
+    # The leaf ranges of a row partition its regions, so sorting by (row, first) lays them out in order
+    rows, nodes, first, last = (np.concatenate(parts) for parts in zip(*leaves))
+    order = np.lexsort((first, rows))
+    return np.repeat(nodes[order], (last - first + 1)[order]).reshape(X.shape[0], n_regions)
+
+
+def build_index(engine, preprocessing, directory, chunk_size=CHUNK_SIZE):
+    """Enumerate every discrete combination and write its glucose step function to `directory`."""
+    fields = _fields(preprocessing)
+    feature_names = list(preprocessing.get_feature_names_out())
+    glucose_feature = feature_names.index("remainder__avg_glucose_level")
+    internal = ~engine.is_leaf
+    glucose = np.unique(engine.threshold[internal & (engine.feature == glucose_feature)])
+    n_combinations = int(np.prod([len(values) for _, values in fields]))
+    n_trees = len(engine.roots)
+    encoded = _encoded_combinations(preprocessing, fields, np.arange(n_combinations))
+    # Contiguous per-class leaf values gather much faster than columns of the 2-D array
+    negative_value = np.ascontiguousarray(engine.value[:, 0])
+    positive_value = np.ascontiguousarray(engine.value[:, 1])
+
+    # Many combinations share a step function (unknown categories often behave like a known one),
+    # so each distinct function is stored once and combinations point at it
+    functions = np.zeros(n_combinations, dtype=np.uint32)
+    # Breaks index into `glucose`: uint16 unless the forest has more thresholds than that can address
+    break_dtype = np.promote_types(np.uint16, np.min_scalar_type(len(glucose)))
+    known = {}
+    lengths, breaks, proba, prediction = [0], [], [], []
+    for start in range(0, n_combinations, chunk_size):
+        codes = np.arange(start, min(start + chunk_size, n_combinations))
+        X = encoded[codes]
+        negative = np.zeros((len(codes), len(glucose) + 1))
+        positive = np.zeros((len(codes), len(glucose) + 1))
+        # Summed tree by tree, in the same order as RandomForestClassifier
+        for root in engine.roots:
+            leaves = _tree_leaves(engine, X, root, glucose_feature, glucose)
+            negative += np.take(negative_value, leaves)
+            positive += np.take(positive_value, leaves)
+        negative /= n_trees
+        positive /= n_trees
+        # argmax over (negative, positive) keeps the first class on ties
+        predicted = positive > negative
+        changes = (positive[:, 1:] != positive[:, :-1]) | (predicted[:, 1:] != predicted[:, :-1])
+        for code, row_changes, row_positive, row_predicted in zip(codes, changes, positive, predicted):
+            # A segment starting at region r + 1 begins just above glucose[r]
+            row_breaks = np.flatnonzero(row_changes).astype(break_dtype)
+            starts = np.concatenate([[0], row_breaks.astype(np.int64) + 1])
+            key = (row_breaks.tobytes(), row_positive[starts].tobytes(), row_predicted[starts].tobytes())
+            function = known.get(key)
+            if function is None:
+                function = known[key] = len(known)
+                lengths.append(len(row_breaks))
+                breaks.append(row_breaks)
+                proba.append(row_positive[starts])
+                prediction.append(row_predicted[starts])
+            functions[code] = function
+
+    arrays = {
+        "glucose": glucose,
+        "functions": functions,
+        "offsets": np.cumsum(lengths),
+        "breaks": np.concatenate(breaks),
+        "proba": np.concatenate(proba),
+        "prediction": np.concatenate(prediction).astype(np.int8),
+    }
+    os.makedirs(directory, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f"{name}.npy"), array)
+    manifest = {
+        "fields": fields,
+        "n_combinations": n_combinations,
+        "n_functions": len(known),
+        "max_segments": int(np.diff(arrays["offsets"]).max()) + 1,
+        "classes": np.asarray(engine.classes_).tolist(),
+    }
+    with open(os.path.join(directory, "manifest.json"), "w") as file:
+        json.dump(manifest, file, indent=2)
+
+
+class StrokeIndex:
+    """Lookup of stroke predictions in the precomputed decision regions."""
+
+    def __init__(self, glucose, functions, offsets, breaks, proba, prediction, fields, classes):
+        self.glucose = np.asarray(glucose)
+        self.functions = np.asarray(functions)
+        self.offsets = np.asarray(offsets)
+        self.breaks = np.asarray(breaks)
+        self.proba = np.asarray(proba)
+        self.prediction = np.asarray(prediction)
+        self.fields = fields
+        self.classes_ = np.asarray(classes)
+        self.radices = [len(values) for _, values in fields]
+        self.n_combinations = int(np.prod(self.radices))
+        # Category -> digit for the categorical fields; anything else takes the last, unknown, digit
+        self.tables = {name: {value: digit for digit, value in enumerate(values[:-1])}
+                       for name, values in fields if values[-1] is None}
+
+    @classmethod
+    def load(cls, directory=None, mmap=True):
+        directory = directory or artifact_path(INDEX_DIR)
+        with open(os.path.join(directory, "manifest.json")) as file:
+            manifest = json.load(file)
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r" if mmap else None)
+                  for name in ARRAYS}
+        return cls(fields=manifest["fields"], classes=manifest["classes"], **arrays)
+
+    def codes(self, frame):
+        """Combination code of every row of `frame`, or -1 where the index does not apply."""
+        glucose = np.asarray(frame["avg_glucose_level"], dtype=np.float64)
+        covered = ~np.isnan(glucose)
+        digits = []
+        for name, values in self.fields:
+            column = np.asarray(frame[name])
+            if values[-1] is None:
+                # Anything the encoder was not fitted on shares the last slot; missing values are not covered
+                lookup = self.tables[name]
+                unknown = len(values) - 1
+                digit = np.array([lookup.get(value, unknown) for value in column.tolist()], dtype=np.int64)
+                covered &= np.array([value == value and value is not None for value in column.tolist()], dtype=bool)
+            else:
+                number = np.asarray(column, dtype=np.float64) - values[0]
+                valid = (number == np.round(number)) & (number >= 0) & (number < len(values))
+                covered &= valid
+                digit = np.where(valid, number, 0).astype(np.int64)
+            digits.append(digit)
+        codes = np.ravel_multi_index(digits, self.radices)
+        return np.where(covered, codes, -1)
+
+    def lookup(self, codes, glucose):
+        """Segment index of each (code, glucose) pair, by binary search over the breaks of its function."""
+        # Trees compare a float32 copy of the input against the float64 thresholds
+        glucose = np.asarray(glucose, dtype=np.float32).astype(np.float64)
+        functions = self.functions[codes].astype(np.int64)
+        low = self.offsets[functions]
+        high = self.offsets[functions + 1]
+        while True:
+            searching = low < high
+            if not searching.any():
+                break
+            middle = (low + high) // 2
+            below = searching & (self.glucose[self.breaks[np.where(searching, middle, 0)]] < glucose)
+            low = np.where(below, middle + 1, low)
+            high = np.where(searching & ~below, middle, high)
+        # Function f has one more segment than breaks, so its segments start at offsets[f] + f
+        return low + functions
+
+    def predict(self, frame):
+        """Return (predictions, stroke probabilities, covered) for every row of `frame`.
+
+        Rows where `covered` is False have undefined results and must be scored by the forest.
+        """
+        codes = self.codes(frame)
+        covered = codes >= 0
+        segments = self.lookup(np.where(covered, codes, 0), np.nan_to_num(np.asarray(frame["avg_glucose_level"], dtype=np.float64)))
+        predictions = self.classes_.take(self.prediction[segments].astype(np.int64))
+        return predictions, self.proba[segments], covered
+
+    def predict_record(self, record):
+        """(prediction, stroke probability) of a single dict, or None when the index does not apply.
+
+        Plain Python arithmetic; for one record this is much cheaper than the vectorized path.
+        """
+        code = 0
+        for (name, values), radix in zip(self.fields, self.radices):
+            value = record[name]
+            if values[-1] is None:
+                if value is None or value != value:
+                    return None
+                digit = self.tables[name].get(value, radix - 1)
+            else:
+                number = float(value) - values[0]
+                if not (number.is_integer() and 0 <= number < radix):
+                    return None
+                digit = int(number)
+            code = code * radix + digit
+        glucose = record["avg_glucose_level"]
+        if glucose is None or glucose != glucose:
+            return None
+        function = int(self.functions[code])
+        low, high = int(self.offsets[function]), int(self.offsets[function + 1])
+        # Trees compare a float32 copy of the input against the float64 thresholds
+        segment = low + function + int(np.searchsorted(self.glucose[self.breaks[low:high]], float(np.float32(glucose))))
+        return self.classes_[self.prediction[segment]].item(), float(self.proba[segment])
+
+
+def verify(index, model, preprocessing, n_samples=50000, seed=0):
+    """Compare the index with `predict_proba` of the scikit-learn forest.
+
+    Glucose is drawn around every threshold as well as uniformly, so the
+    segment boundaries themselves are exercised.
+    """
+    from inference.forest_engine import random_stroke_records
+
+    rng = np.random.default_rng(seed)
+    records = random_stroke_records(preprocessing, n_samples, seed)
+    edges = rng.choice(index.glucose, n_samples // 2).astype(np.float32)
+    # The threshold itself and the nearest float32 value on either side
+    edges = np.select([rng.random(len(edges)) < 1 / 3, rng.random(len(edges)) < 1 / 2],
+                      [np.nextafter(edges, np.float32(-np.inf)), np.nextafter(edges, np.float32(np.inf))], edges)
+    records.loc[: len(edges) - 1, "avg_glucose_level"] = edges
+    # Values the encoder does not know, as the Streamlit page sends them
+    records.loc[rng.random(n_samples) < 0.2, "work_type"] = "Children"
+    records.loc[rng.random(n_samples) < 0.2, "smoking_status"] = "Formerly smoked"
+    records.loc[rng.random(n_samples) < 0.2, "gender"] = "Other"
+    predictions, proba, covered = index.predict(records)
+    X = preprocessing.transform(records[covered])
+    expected = model.predict_proba(X)[:, list(model.classes_).index(1)]
+    return {
+        "samples": int(covered.sum()),
+        "identical_probabilities": bool(np.array_equal(expected, proba[covered])),
+        "max_abs_proba_diff": float(np.max(np.abs(expected - proba[covered]))),
+        "prediction_mismatches": int(np.sum(model.predict(X) != predictions[covered])),
+    }
+
+
+def main(argv=None):
+    from joblib import load
+
+    from inference.forest_engine import ENGINE_DIR, ForestEngine
+
+    parser = argparse.ArgumentParser(description="Precompute the decision regions of the stroke random forest.")
+    parser.add_argument("--model", default=artifact_path("rf_model.sav"))
+    parser.add_argument("--forest", default=artifact_path(ENGINE_DIR), help="flat forest export of --model")
+    parser.add_argument("--preprocessing", default=artifact_path("preprocessing.joblib"))
+    parser.add_argument("--out", default=artifact_path(INDEX_DIR))
+    args = parser.parse_args(argv)
+
+    model = load(args.model)
+    model = getattr(model, "best_estimator_", model)
+    preprocessing = load(args.preprocessing)
+    build_index(ForestEngine.load(args.forest), preprocessing, args.out)
+    index = StrokeIndex.load(args.out)
+    report = verify(index, model, preprocessing)
+    size = sum(os.path.getsize(os.path.join(args.out, name)) for name in os.listdir(args.out))
+    print(f"Wrote {args.out}: {index.n_combinations} combinations, {len(index.offsets) - 1} distinct step functions, "
+          f"{len(index.proba)} segments, {size / 2 ** 20:.1f} MB")
+    print(f"Identical probabilities: {report['identical_probabilities']} "
+          f"(max |difference| {report['max_abs_proba_diff']:.3e} over {report['samples']} rows)")
+    print(f"Prediction mismatches: {report['prediction_mismatches']}")
+    if not report["identical_probabilities"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
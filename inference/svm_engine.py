@@ -0,0 +1,158 @@
+"""NumPy-only scorer for the breast-cancer SVC.
+
+The fitted StandardScaler and SVC are exported to a small `.npz` bundle of
+plain arrays (support vectors, dual coefficients, intercept, kernel
+parameters, scaler mean/scale). `SVMEngine` reproduces `decision_function`
+and `predict` from that bundle without importing scikit-learn. The scaler is
+folded into the kernel: the support vectors are pre-divided by the scale, so
+raw feature rows go straight into one matrix product.
+
+Export and verify against the pickled model from the repository root:
+
+    python -m inference.svm_engine --model pages/SVM_cancer.sav --scaler pages/scaler.pkl
+"""
+import argparse
+import pickle
+
+import numpy as np
+
+from inference.registry import artifact_path
+
+ENGINE_FILE = "svm_cancer_engine.npz"
+# Rows scored per block; keeps the (rows x support vectors) kernel matrix small
+BLOCK_SIZE = 8192
+
+
+def export_svm(model, scaler, path, feature_names=None):
+    """Write the arrays needed to score `scaler` + `model` to `path`."""
+    model = getattr(model, "best_estimator_", model)
+    if len(model.classes_) != 2:
+        raise ValueError("Only binary SVC models can be exported")
+    if feature_names is None:
+        feature_names = scaler.feature_names_in_
+    np.savez(
+        path,
+        support_vectors=np.asarray(model.support_vectors_, dtype=np.float64),
+        dual_coef=np.asarray(model.dual_coef_, dtype=np.float64).ravel(),
+        intercept=np.asarray(model.intercept_, dtype=np.float64).ravel(),
+        classes=np.asarray(model.classes_),
+        kernel=np.array(model.kernel),
+        gamma=np.array(model._gamma, dtype=np.float64),
+        coef0=np.array(model.coef0, dtype=np.float64),
+        degree=np.array(model.degree, dtype=np.float64),
+        mean=np.asarray(scaler.mean_, dtype=np.float64),
+        scale=np.asarray(scaler.scale_, dtype=np.float64),
+        feature_names=np.asarray(feature_names, dtype=str),
+    )
+
+
+class SVMEngine:
+    """Scaler + binary SVC decision function over NumPy arrays."""
+
+    def __init__(self, support_vectors, dual_coef, intercept, classes, kernel, gamma, coef0, degree,
+                 mean, scale, feature_names):
+        if kernel not in ("linear", "poly", "rbf", "sigmoid"):
+            raise ValueError(f"Unsupported kernel {kernel!r}")
+        self.kernel = kernel
+        self.gamma = float(gamma)
+        self.coef0 = float(coef0)
+        self.degree = float(degree)
+        self.dual_coef = dual_coef
+        self.intercept = float(intercept[0])
+        self.classes = classes
+        self.feature_names = [str(name) for name in feature_names]
+        self.mean = mean
+        self.inv_scale = 1.0 / scale
+        # x_scaled . sv == x . (sv / scale) - mean . (sv / scale)
+        self.folded_vectors = support_vectors * self.inv_scale
+        self.folded_offset = self.folded_vectors @ mean
+        self.sv_sq_norms = np.einsum("ij,ij->i", support_vectors, support_vectors)
+        self._cast = {}
+
+    @classmethod
+    def load(cls, path=None):
+        with np.load(path or artifact_path(ENGINE_FILE), allow_pickle=False) as bundle:
+            arrays = {name: bundle[name] for name in bundle.files}
+        arrays["kernel"] = str(arrays["kernel"])
+        return cls(**arrays)
+
+    def _arrays(self, dtype):
+        # Model arrays in the requested precision, converted once
+        if dtype not in self._cast:
+            self._cast[dtype] = tuple(np.asarray(array, dtype=dtype) for array in (
+                self.folded_vectors, self.folded_offset, self.sv_sq_norms, self.dual_coef, self.mean, self.inv_scale))
+        return self._cast[dtype]
+
+    def _decision_block(self, X, dtype):
+        vectors, offset, sv_sq_norms, dual_coef, mean, inv_scale = self._arrays(dtype)
+        dots = X @ vectors.T - offset
+        if self.kernel == "linear":
+            kernel = dots
+        elif self.kernel == "poly":
+            kernel = (self.gamma * dots + self.coef0) ** self.degree
+        elif self.kernel == "sigmoid":
+            kernel = np.tanh(self.gamma * dots + self.coef0)
+        else:
+            scaled = (X - mean) * inv_scale
+            sq_dist = np.einsum("ij,ij->i", scaled, scaled)[:, None] - 2.0 * dots + sv_sq_norms
+            kernel = np.exp(-self.gamma * np.maximum(sq_dist, 0.0))
+        return kernel @ dual_coef + self.intercept
+
+    def decision_function(self, X, block_size=BLOCK_SIZE, dtype=np.float64):
+        """Signed distance to the separating surface for raw (unscaled) rows.
+
+        `X` is a 2-D array with columns in `feature_names` order. Rows are
+        processed in blocks of `block_size`; pass `dtype=np.float32` to trade
+        a little precision for speed on very large batches.
+        """
+        X = np.asarray(X, dtype=dtype)
+        if X.ndim == 1:
+            X = X[None, :]
+        out = np.empty(X.shape[0], dtype=np.float64)
+        for start in range(0, X.shape[0], block_size):
+            out[start:start + block_size] = self._decision_block(X[start:start + block_size], dtype)
+        return out
+
+    def predict(self, X, block_size=BLOCK_SIZE, dtype=np.float64):
+        return self.classes[(self.decision_function(X, block_size, dtype) > 0).astype(int)]
+
+
+def verify(engine, model, scaler, n_samples=10000, seed=0):
+    """Compare the engine with the scikit-learn model on random rows around the training data."""
+    rng = np.random.default_rng(seed)
+    X = engine.mean + rng.standard_normal((n_samples, engine.mean.shape[0])) / engine.inv_scale
+    model = getattr(model, "best_estimator_", model)
+    X_scaled = scaler.transform(X)
+    expected = model.decision_function(X_scaled)
+    actual = engine.decision_function(X)
+    return {
+        "samples": n_samples,
+        "max_abs_decision_diff": float(np.max(np.abs(expected - actual))),
+        "prediction_mismatches": int(np.sum(model.predict(X_scaled) != engine.predict(X))),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the breast-cancer SVC to a NumPy bundle.")
+    parser.add_argument("--model", default=artifact_path("SVM_cancer.sav"))
+    parser.add_argument("--scaler", default=artifact_path("scaler.pkl"))
+    parser.add_argument("--out", default=artifact_path(ENGINE_FILE))
+    args = parser.parse_args(argv)
+
+    # The scaler was fitted on a DataFrame but does not keep its column names
+    from inference.cancer import FEATURES
+
+    with open(args.model, "rb") as model_file, open(args.scaler, "rb") as scaler_file:
+        model = pickle.load(model_file)
+        scaler = pickle.load(scaler_file)
+    export_svm(model, scaler, args.out, FEATURES)
+    report = verify(SVMEngine.load(args.out), model, scaler)
+    print(f"Wrote {args.out}")
+    print(f"Max |decision_function difference|: {report['max_abs_decision_diff']:.3e}")
+    print(f"Prediction mismatches: {report['prediction_mismatches']} / {report['samples']}")
+    if report["prediction_mismatches"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
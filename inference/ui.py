@@ -0,0 +1,25 @@
+"""Small Streamlit widgets shared by the diagnosis pages."""
+import streamlit as st
+
+from inference.registry import model_stats
+
+
+def sidebar_model_stats(names):
+    # Show how long each model took to load and how much memory it added
+    rows = [row for row in model_stats() if row["model"] in names and row["loaded"]]
+    if not rows:
+        return
+    with st.sidebar.expander("Model load stats"):
+        for row in rows:
+            st.write(f"**{row['model']}**: {row['load_seconds']:.2f} s, +{row['rss_delta_mb']:.1f} MB")
+
+
+def sidebar_cache_stats(stats):
+    # Hit/miss counters of a prediction cache
+    lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+    if not lookups:
+        return
+    with st.sidebar.expander("Prediction cache"):
+        st.write(f"{stats['entries']} / {stats['max_entries']} entries in memory")
+        st.write(f"Hits: {stats['hits']} memory, {stats['disk_hits']} disk; misses: {stats['misses']}")
+        st.write(f"Hit rate: {stats['hit_rate']:.0%}")
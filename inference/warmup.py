@@ -0,0 +1,47 @@
+"""Background warm-up of the diagnosis models.
+
+The landing page calls `start_warmup()` after it has rendered, so the first
+visit to a diagnosis page does not pay for importing TensorFlow, XGBoost or
+scikit-learn and deserializing the model. This module only imports the
+standard library at import time; everything heavy happens on the thread.
+"""
+import importlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Cheapest models first so the tabular pages are ready as early as possible
+WARMUP_ORDER = ("inference.heart", "inference.cancer", "inference.stroke", "inference.xray")
+
+_started = False
+_lock = threading.Lock()
+_status = {}
+
+
+def _warm(modules):
+    for module_name in modules:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(module_name).load()
+        except Exception as error:  # a missing artifact must not break the app
+            _status[module_name] = f"failed: {error}"
+            logger.warning("Warm-up of %s failed: %s", module_name, error)
+        else:
+            _status[module_name] = f"ready in {time.perf_counter() - start:.2f}s"
+
+
+def start_warmup(modules=WARMUP_ORDER):
+    """Load every model once per process on a daemon thread; later calls are no-ops."""
+    global _started
+    with _lock:
+        if _started:
+            return False
+        _started = True
+    threading.Thread(target=_warm, args=(modules,), name="model-warmup", daemon=True).start()
+    return True
+
+
+def warmup_status():
+    return dict(_status)
@@ -0,0 +1,140 @@
+"""Native-format export and bare-Booster scoring for the heart-disease model.
+
+`pages/xgboost_heart_disease_model.sav` pickles the whole BayesSearchCV object,
+so loading it unpickles every CV result and the skopt optimizer state. The
+export keeps only `best_estimator_`'s Booster in XGBoost's own UBJSON format,
+plus a JSON manifest with the feature order. `HeartBooster` loads that with
+nothing but `xgboost` and predicts in place on NumPy arrays.
+
+Export and verify from the repository root:
+
+    python -m inference.xgb_engine --model pages/xgboost_heart_disease_model.sav
+"""
+import argparse
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+
+from inference.registry import artifact_path
+
+BOOSTER_FILE = "xgb_heart_booster.ubj"
+MANIFEST_FILE = "xgb_heart_booster.json"
+THRESHOLD = 0.5
+
+
+def _iteration_range(model):
+    # Mirrors XGBModel._get_iteration_range: use best_iteration after early stopping
+    try:
+        best_iteration = model.best_iteration
+    except AttributeError:
+        return None
+    return [0, int(best_iteration) + 1]
+
+
+def export_booster(model, booster_path, manifest_path):
+    """Save the best estimator's Booster natively and write its manifest."""
+    model = getattr(model, "best_estimator_", model)
+    booster = model.get_booster()
+    booster.save_model(booster_path)
+    config = json.loads(booster.save_config())
+    manifest = {
+        "features": list(booster.feature_names),
+        "feature_types": list(booster.feature_types or []),
+        "objective": config["learner"]["objective"]["name"],
+        "classes": np.asarray(model.classes_).tolist(),
+        "iteration_range": _iteration_range(model),
+        "threshold": THRESHOLD,
+    }
+    with open(manifest_path, "w") as file:
+        json.dump(manifest, file, indent=2)
+    return manifest
+
+
+class HeartBooster:
+    """Binary XGBoost Booster with the feature order it was trained on."""
+
+    def __init__(self, booster, manifest):
+        self.booster = booster
+        self.features = manifest["features"]
+        self.classes_ = np.asarray(manifest["classes"])
+        self.threshold = manifest["threshold"]
+        iteration_range = manifest.get("iteration_range")
+        self.iteration_range = tuple(iteration_range) if iteration_range else (0, 0)
+
+    @classmethod
+    def load(cls, booster_path=None, manifest_path=None, nthread=None):
+        import xgboost as xgb
+
+        with open(manifest_path or artifact_path(MANIFEST_FILE)) as file:
+            manifest = json.load(file)
+        params = {"nthread": nthread} if nthread else {}
+        booster = xgb.Booster(params, model_file=booster_path or artifact_path(BOOSTER_FILE))
+        return cls(booster, manifest)
+
+    def predict_proba(self, X):
+        """Probability of heart disease for rows in `features` order."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        return self.booster.inplace_predict(X, iteration_range=self.iteration_range, validate_features=False)
+
+    def predict(self, X):
+        return (self.predict_proba(X) > self.threshold).astype(int)
+
+
+def verify(engine, model, n_samples=20000, seed=0):
+    """Compare the bare Booster with the pickled model on random heart records."""
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    columns = {
+        "Age": rng.integers(21, 78, n_samples), "Sex": rng.integers(0, 2, n_samples),
+        "BP": rng.integers(94, 201, n_samples), "Cholesterol": rng.integers(126, 565, n_samples),
+        "FBS over 120": rng.integers(0, 2, n_samples), "EKG results": rng.integers(0, 3, n_samples),
+        "Max HR": rng.integers(71, 203, n_samples), "Exercise angina": rng.integers(0, 2, n_samples),
+        "ST depression": np.round(rng.uniform(0.0, 6.2, n_samples), 1), "Slope of ST": rng.integers(1, 4, n_samples),
+        "Number of vessels fluro": rng.integers(0, 4, n_samples), "Thallium": rng.integers(3, 8, n_samples),
+        "Chest pain type_2": rng.integers(0, 2, n_samples), "Chest pain type_3": rng.integers(0, 2, n_samples),
+        "Chest pain type_4": rng.integers(0, 2, n_samples),
+    }
+    frame = pd.DataFrame(columns)[engine.features]
+    expected = getattr(model, "best_estimator_", model).predict_proba(frame)[:, 1]
+    actual = engine.predict_proba(frame.to_numpy(dtype=np.float32))
+    return {
+        "samples": n_samples,
+        "max_abs_proba_diff": float(np.max(np.abs(expected - actual))),
+        "prediction_mismatches": int(np.sum((expected > THRESHOLD) != (actual > THRESHOLD))),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the heart-disease XGBoost model in native format.")
+    parser.add_argument("--model", default=artifact_path("xgboost_heart_disease_model.sav"))
+    parser.add_argument("--out", default=artifact_path(BOOSTER_FILE))
+    parser.add_argument("--manifest", default=artifact_path(MANIFEST_FILE))
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    with open(args.model, "rb") as file:
+        model = pickle.load(file)
+    pickle_seconds = time.perf_counter() - start
+    export_booster(model, args.out, args.manifest)
+
+    start = time.perf_counter()
+    engine = HeartBooster.load(args.out, args.manifest)
+    booster_seconds = time.perf_counter() - start
+    report = verify(engine, model)
+    print(f"Wrote {args.out} and {args.manifest}")
+    print(f"Artifact size: {os.path.getsize(args.model) / 1024:.0f} KB pickle -> {os.path.getsize(args.out) / 1024:.0f} KB booster")
+    print(f"Load time: {pickle_seconds * 1000:.1f} ms pickle -> {booster_seconds * 1000:.1f} ms booster")
+    print(f"Max |probability difference|: {report['max_abs_proba_diff']:.3e}, "
+          f"prediction mismatches: {report['prediction_mismatches']} / {report['samples']}")
+    if report["prediction_mismatches"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Chest X-ray batched CNN inference."""
+import itertools
+import os
+import queue
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from inference.prediction_cache import PredictionCache, content_key
+from inference.registry import artifact_path, get_model, model_version
+from inference.xray_preprocess import DECODE_WORKERS, IMAGE_SHAPE, decode, decode_batch
+from inference.xray_tflite import TFLITE_FILES
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+BATCH_SIZE = 32
+# Number of decoded batches allowed to wait for the model
+PREFETCH_BATCHES = 2
+THRESHOLD = 0.5
+# Single-image prediction cache: XRAY_CACHE_SIZE entries in memory, plus XRAY_CACHE_DIR on disk when set
+CACHE_SIZE = int(os.environ.get("XRAY_CACHE_SIZE", 256))
+CACHE_DIR = os.environ.get("XRAY_CACHE_DIR") or None
+
+
+def _backend():
+    # XRAY_BACKEND=keras|student|int8|float16 overrides; otherwise prefer the int8 model when it exists
+    backend = os.environ.get("XRAY_BACKEND")
+    if backend:
+        return backend
+    return "int8" if os.path.exists(artifact_path(TFLITE_FILES["int8"])) else "keras"
+
+
+BACKEND = _backend()
+
+
+def model_names():
+    return ["cnn_xray" if BACKEND == "keras" else f"cnn_xray_{BACKEND}"]
+
+
+def load():
+    for name in model_names():
+        get_model(name)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def prediction_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PredictionCache(CACHE_SIZE, CACHE_DIR, name="xray")
+    return _cache
+
+
+def cache_stats():
+    return prediction_cache().stats()
+
+
+def predict_image(data):
+    """Predict one image, reusing the stored result when the same bytes were seen before.
+
+    The key covers the image content and the model artifact, so re-uploads of a
+    study skip decoding and inference entirely. Unreadable images are not cached.
+    """
+    from inference.batching import get_batcher
+
+    cache = prediction_cache()
+    key = content_key(data, model_version(model_names()[0]))
+    prediction = cache.get(key)
+    if prediction is None:
+        prediction = get_batcher("xray").predict(data)
+        if prediction["error"] is None:
+            cache.put(key, prediction)
+    return prediction
+
+
+def load_xray(data):
+    """Decode image bytes to the (150, 150, 3) float32 [0, 1] input of the CNN."""
+    return decode(data)
+
+
+def _image_members(archive):
+    for info in archive.infolist():
+        name = info.filename
+        if info.is_dir() or name.startswith("__MACOSX/") or os.path.basename(name).startswith("."):
+            continue
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            yield info
+
+
+def count_zip_images(zip_file):
+    with zipfile.ZipFile(zip_file) as archive:
+        return sum(1 for _ in _image_members(archive))
+
+
+def iter_zip_images(zip_file):
+    """Yield (name, bytes) for every image inside a zip archive."""
+    with zipfile.ZipFile(zip_file) as archive:
+        for info in _image_members(archive):
+            yield info.filename, archive.read(info)
+
+
+def _put(batches, item, stop):
+    # Give up once the consumer has stopped reading, instead of blocking on a full queue forever
+    while not stop.is_set():
+        try:
+            batches.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _batch_producer(items, batches, batch_size, workers, stop):
+    # Decode each batch on a thread pool, straight into the array the model will read
+    items = iter(items)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                chunk = list(itertools.islice(items, batch_size))
+                if not chunk:
+                    break
+                buffer = np.zeros((batch_size,) + IMAGE_SHAPE, dtype=np.float32)
+                _, errors = decode_batch([data for _, data in chunk], out=buffer[:len(chunk)], pool=pool)
+                if not _put(batches, ([name for name, _ in chunk], buffer, errors), stop):
+                    return
+    except Exception as error:  # e.g. a corrupt archive; re-raised in the caller
+        _put(batches, error, stop)
+    finally:
+        # Closes the archive behind iter_zip_images even when the consumer stopped early
+        close = getattr(items, "close", None)
+        if close is not None:
+            close()
+        _put(batches, None, stop)
+
+
+def predict_images(items, model=None, batch_size=BATCH_SIZE, workers=DECODE_WORKERS, progress=None):
+    """Run the CNN over an iterable of (name, bytes) pairs.
+
+    Images are decoded in worker threads while the model works on the previous
+    batch. Every batch sent to the model has exactly `batch_size` rows (the last
+    one is zero-padded) so Keras never re-traces for a new shape. Returns a list
+    of dicts with the file name, pneumonia probability, label and any error.
+    """
+    model = model or get_model(model_names()[0])
+    batches = queue.Queue(maxsize=PREFETCH_BATCHES)
+    stop = threading.Event()
+    producer = threading.Thread(target=_batch_producer, args=(items, batches, batch_size, workers, stop), daemon=True)
+    producer.start()
+
+    results = []
+    try:
+        while True:
+            batch = batches.get()
+            if batch is None:
+                break
+            if isinstance(batch, Exception):
+                raise batch
+            names, buffer, errors = batch
+            # Unused and failed rows are zero; every call sees the same batch shape
+            probabilities = np.asarray(model.predict_on_batch(buffer)).reshape(-1)
+            for name, probability, error in zip(names, probabilities, errors):
+                if error is not None:
+                    results.append({"file": name, "probability": None, "prediction": "Unreadable image",
+                                    "error": error})
+                else:
+                    results.append({
+                        "file": name,
+                        "probability": float(probability),
+                        "prediction": "Pneumonia" if probability > THRESHOLD else "Normal",
+                        "error": None,
+                    })
+            if progress is not None:
+                progress(len(results))
+    finally:
+        # predict_on_batch or progress may raise; let the producer exit rather than block on a full queue
+        stop.set()
+        producer.join()
+    return results
@@ -0,0 +1,258 @@
+"""Quantized TFLite runtime path for the pneumonia CNN.
+
+`convert` turns `ANN_ChestXRay_model.h5` into two TFLite models:
+
+* float16 weights (half the size, same float32 activations), and
+* full post-training int8 quantization, calibrated on a sample of the
+  training directory run through the same preprocessing as the app.
+
+`TFLiteXrayModel` runs either file through the lightweight
+`ai_edge_litert` or `tflite_runtime` interpreter when one is installed
+(falling back to `tf.lite.Interpreter`), with a configurable thread count, and exposes the
+same `predict_on_batch` call as the Keras model so `inference.xray` can use
+it unchanged. `inference.xray` picks the int8 model when it exists; set
+XRAY_BACKEND=keras|student|int8|float16 to override and XRAY_TFLITE_THREADS
+to cap interpreter threads. "student" is the compact Keras model distilled
+by `python -m training cnn-xray --student`.
+
+From the repository root:
+
+    python -m inference.xray_tflite convert --calibration-dir chest_xray/train
+    python -m inference.xray_tflite report --test-dir chest_xray/test
+    python -m inference.xray_tflite report --test-dir chest_xray/test --backends keras,student
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+from inference.registry import artifact_path
+
+KERAS_FILE = "ANN_ChestXRay_model.h5"
+STUDENT_FILE = "ANN_ChestXRay_student.h5"
+TFLITE_FILES = {"int8": "ANN_ChestXRay_model_int8.tflite", "float16": "ANN_ChestXRay_model_float16.tflite"}
+BACKEND_FILES = {"keras": KERAS_FILE, "student": STUDENT_FILE, **TFLITE_FILES}
+CALIBRATION_SAMPLES = 200
+THRESHOLD = 0.5
+
+
+def _interpreter_class():
+    # Standalone runtimes avoid importing TensorFlow at all
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+def list_images(directory):
+    """(path, label) pairs for a flow_from_directory layout, classes in sorted order."""
+    from inference.xray import IMAGE_EXTENSIONS
+
+    classes = sorted(entry for entry in os.listdir(directory) if os.path.isdir(os.path.join(directory, entry)))
+    images = []
+    for label, class_name in enumerate(classes):
+        class_dir = os.path.join(directory, class_name)
+        for file_name in sorted(os.listdir(class_dir)):
+            if file_name.lower().endswith(IMAGE_EXTENSIONS):
+                images.append((os.path.join(class_dir, file_name), label))
+    return images
+
+
+def _load_file(path):
+    from inference.xray import load_xray
+
+    with open(path, "rb") as file:
+        return load_xray(file.read())
+
+
+def representative_dataset(calibration_dir, samples=CALIBRATION_SAMPLES, seed=0):
+    """Calibration generator over a random sample of the training images."""
+    images = list_images(calibration_dir)
+    random.Random(seed).shuffle(images)
+
+    def generator():
+        for path, _ in images[:samples]:
+            yield [_load_file(path)[np.newaxis, ...]]
+
+    return generator
+
+
+def convert(keras_path, calibration_dir, out_dir, samples=CALIBRATION_SAMPLES):
+    """Write the float16 and int8 TFLite models; returns {variant: path}."""
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(keras_path)
+    paths = {}
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.target_spec.supported_types = [tf.float16]
+    paths["float16"] = os.path.join(out_dir, TFLITE_FILES["float16"])
+    with open(paths["float16"], "wb") as file:
+        file.write(converter.convert())
+
+    # Full integer quantization; input and output stay float32 so callers are unchanged
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset(calibration_dir, samples)
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    paths["int8"] = os.path.join(out_dir, TFLITE_FILES["int8"])
+    with open(paths["int8"], "wb") as file:
+        file.write(converter.convert())
+    return paths
+
+
+class TFLiteXrayModel:
+    """TFLite interpreter with a Keras-like `predict_on_batch`."""
+
+    def __init__(self, path, num_threads=None):
+        Interpreter = _interpreter_class()
+        self.path = path
+        self.num_threads = num_threads or os.cpu_count() or 1
+        self._interpreter = Interpreter(model_path=path, num_threads=self.num_threads)
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._batch_size = None
+        # Interpreters are not thread-safe; the page and the batcher may call concurrently
+        self._lock = threading.Lock()
+
+    def _resize(self, batch_size):
+        if batch_size != self._batch_size:
+            shape = [batch_size] + list(self._input["shape"][1:])
+            self._interpreter.resize_tensor_input(self._input["index"], shape)
+            self._interpreter.allocate_tensors()
+            self._batch_size = batch_size
+
+    def predict_on_batch(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        with self._lock:
+            self._resize(batch.shape[0])
+            self._interpreter.set_tensor(self._input["index"], batch)
+            self._interpreter.invoke()
+            return self._interpreter.get_tensor(self._output["index"]).copy()
+
+    def predict(self, batch):
+        return self.predict_on_batch(batch)
+
+
+def _load_backend(backend, out_dir, num_threads=None):
+    if backend in ("keras", "student"):
+        import tensorflow as tf
+        return tf.keras.models.load_model(os.path.join(out_dir, BACKEND_FILES[backend]))
+    return TFLiteXrayModel(os.path.join(out_dir, TFLITE_FILES[backend]), num_threads)
+
+
+def _probe(backend, out_dir, num_threads):
+    # Runs in a fresh interpreter process: cold start, first prediction and peak RSS
+    import resource
+
+    start = time.perf_counter()
+    model = _load_backend(backend, out_dir, num_threads)
+    loaded = time.perf_counter()
+    model.predict_on_batch(np.zeros((1, 150, 150, 3), dtype=np.float32))
+    first = time.perf_counter()
+    print(json.dumps({
+        "cold_start_seconds": loaded - start,
+        "first_prediction_seconds": first - loaded,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def _latency_ms(model, batch_size, repeats=20):
+    # Rescaled like `xray_preprocess.decode`; values outside [0, 1] would saturate the int8 input quantizer
+    batch = np.random.default_rng(0).uniform(0, 1, (batch_size, 150, 150, 3)).astype(np.float32)
+    model.predict_on_batch(batch)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        model.predict_on_batch(batch)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def report(test_dir, out_dir, num_threads=None, limit=None, backends=("keras", "float16", "int8")):
+    """Accuracy parity against the Keras model plus latency, RSS and cold start per backend.
+
+    Parity is measured against "keras" when it is reported, otherwise against
+    the first backend; the parity columns are named after that backend.
+    """
+    images = list_images(test_dir)[:limit]
+    labels = np.array([label for _, label in images])
+    inputs = np.stack([_load_file(path) for path, _ in images])
+    reference_backend = "keras" if "keras" in backends else backends[0]
+    rows = {}
+    reference = None
+    # The reference runs first so every other backend can be compared with it
+    for backend in [reference_backend] + [backend for backend in backends if backend != reference_backend]:
+        model = _load_backend(backend, out_dir, num_threads)
+        probabilities = np.concatenate([np.asarray(model.predict_on_batch(inputs[start:start + 32])).reshape(-1)
+                                        for start in range(0, len(inputs), 32)])
+        if backend == reference_backend:
+            reference = probabilities
+        probe = subprocess.run(
+            [sys.executable, "-m", "inference.xray_tflite", "_probe", backend, "--out-dir", out_dir,
+             "--threads", str(num_threads or 0)],
+            capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        rows[backend] = dict(
+            json.loads(probe.stdout.strip().splitlines()[-1]),
+            size_mb=os.path.getsize(os.path.join(out_dir, BACKEND_FILES[backend])) / 2 ** 20,
+            params=model.count_params() if hasattr(model, "count_params") else float("nan"),
+            accuracy=float(np.mean((probabilities > THRESHOLD) == labels)),
+            latency_batch1_ms=_latency_ms(model, 1),
+            latency_batch32_ms=_latency_ms(model, 32),
+            **{f"agreement_with_{reference_backend}":
+               float(np.mean((probabilities > THRESHOLD) == (reference > THRESHOLD))),
+               f"max_abs_diff_vs_{reference_backend}": float(np.max(np.abs(probabilities - reference)))},
+        )
+    return {backend: rows[backend] for backend in backends}
+
+
+def _print_table(rows):
+    first = next(iter(rows.values()))
+    parity = [column for column in first if column.startswith(("agreement_with_", "max_abs_diff_vs_"))]
+    columns = ["size_mb", "params", "accuracy", *parity, "latency_batch1_ms", "latency_batch32_ms",
+               "cold_start_seconds", "first_prediction_seconds", "peak_rss_mb"]
+    print("| backend | " + " | ".join(columns) + " |")
+    print("|---" * (len(columns) + 1) + "|")
+    for backend, row in rows.items():
+        print(f"| {backend} | " + " | ".join(f"{row[column]:.4g}" for column in columns) + " |")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Quantize and benchmark the pneumonia CNN.")
+    parser.add_argument("command", choices=["convert", "report", "_probe"])
+    parser.add_argument("backend", nargs="?", help=argparse.SUPPRESS)
+    parser.add_argument("--keras", default=artifact_path(KERAS_FILE))
+    parser.add_argument("--out-dir", default=os.path.dirname(artifact_path(KERAS_FILE)))
+    parser.add_argument("--calibration-dir", help="training directory (one sub-folder per class)")
+    parser.add_argument("--samples", type=int, default=CALIBRATION_SAMPLES, help="calibration images")
+    parser.add_argument("--test-dir", help="test directory (one sub-folder per class)")
+    parser.add_argument("--limit", type=int, help="only use the first N test images")
+    parser.add_argument("--threads", type=int, default=0, help="interpreter threads (0 = all cores)")
+    parser.add_argument("--backends", default="keras,float16,int8", help="comma-separated backends to report")
+    args = parser.parse_args(argv)
+
+    if args.command == "_probe":
+        _probe(args.backend, args.out_dir, args.threads or None)
+    elif args.command == "convert":
+        if not args.calibration_dir:
+            parser.error("convert needs --calibration-dir")
+        for variant, path in convert(args.keras, args.calibration_dir, args.out_dir, args.samples).items():
+            print(f"{variant}: {path} ({os.path.getsize(path) / 2 ** 20:.1f} MB)")
+    else:
+        if not args.test_dir:
+            parser.error("report needs --test-dir")
+        _print_table(report(args.test_dir, args.out_dir, args.threads or None, args.limit, args.backends.split(",")))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,13 @@
 import streamlit as st
-import pickle
-import pandas as pd
+from inference import cancer
+from inference.batching import get_batcher
+from inference.ui import sidebar_model_stats
 
 # This should be the first Streamlit command used in your app, and it should only be called once!
 st.set_page_config(page_title="Breast Cancer Risk Prediction App 🩺", page_icon="🔍", layout="wide")
 
-# Load the saved model and scaler
-@st.cache_resource
-def load_model_scaler():
-    with open('pages/SVM_cancer.sav', 'rb') as model_file, open('pages/scaler.pkl', 'rb') as scaler_file:
-        model = pickle.load(model_file)
-        scaler = pickle.load(scaler_file)
-    return model, scaler
-
-model, scaler = load_model_scaler()
+# Load the saved model and scaler through the shared registry (once per process)
+cancer.load()
 
 # Define a background image
 background_image = "breast_cancer.jpg" 
@@ -44,6 +38,7 @@ st.sidebar.info("""
     If you require professional medical advice or assistance, 
     please contact a healthcare provider immediately.
 """)
+sidebar_model_stats(cancer.model_names())
 
 # Create a form for user input
 with st.form("prediction_form"):
@@ -89,10 +84,9 @@ with st.form("prediction_form"):
 
 # Process user input and provide a prediction
 if submit_button:
-    input_df = pd.DataFrame([input_data])
-    input_scaled = scaler.transform(input_df)
-    prediction = model.predict(input_scaled)
-    result = "Malignant" if prediction[0] == 0 else "Benign"
+    # Concurrent sessions are merged into one vectorized call by the micro-batcher
+    prediction = get_batcher("cancer").predict(input_data)["prediction"]
+    result = "Malignant" if prediction == 0 else "Benign"
 
     # Display results with a custom message
     st.subheader(f"The prediction is: **{result}**")
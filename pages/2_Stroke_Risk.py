@@ -1,19 +1,21 @@
+import os
+import tempfile
 import streamlit as st
-import pandas as pd
-from joblib import load
+from inference import stroke
+from inference.batching import get_batcher
+from inference.stroke import FEATURES, count_rows, score_csv
+from inference.ui import sidebar_model_stats
 
 # Set page configuration
 st.set_page_config(page_title="Stroke Risk Predictor", layout="wide", page_icon=":brain:")
 
-# Load the pre-trained model and the preprocessing pipeline
-model = load('pages/rf_model.sav')  # Update the path as needed
-preprocessing = load('pages/preprocessing.joblib')
+# Load the pre-trained model and the preprocessing pipeline through the shared registry
+stroke.load()
 
 # Define a function to make predictions
 def predict_stroke_risk(input_data):
-    processed_data = preprocessing.transform(pd.DataFrame([input_data]))
-    prediction = model.predict(processed_data)[0]
-    return prediction
+    # Concurrent sessions are merged into one vectorized call by the micro-batcher
+    return get_batcher("stroke").predict(input_data)["prediction"]
 
 # Header Image
 col1, col2, col3 = st.columns([1, 2, 1])
@@ -35,48 +37,79 @@ st.sidebar.info(
     "If you require professional medical advice or assistance, "
     "please contact a healthcare provider immediately."
 )
+sidebar_model_stats(stroke.model_names())
 
-# Input form
-with st.form(key='prediction_form'):
-    st.subheader("Input Information")
-    gender = st.radio("Gender", ("Male", "Female", "Other"), horizontal=True)
-    age = st.slider("Age", 0, 100, 50)
-    hypertension = st.radio("Hypertension", ("No", "Yes"), horizontal=True)
-    heart_disease = st.radio("Heart disease", ("No", "Yes"), horizontal=True)
-    married = st.radio("Married", ("No", "Yes"), horizontal=True)
-    work_type = st.selectbox("Work type", ("Children", "Govt_job", "Never_worked", "Private", "Self-employed"))
-    residence_type = st.radio("Residence type", ("Rural", "Urban"), horizontal=True)
-    avg_glucose_level = st.number_input("Average Glucose Level", 0.0, 500.0, 100.0, 0.1)
-    smoking_status = st.selectbox("Smoking Status", ("Formerly smoked", "Never smoked", "Smokes", "Unknown"))
+# Bulk scoring: the CSV is read and scored in chunks, results are written to a temporary file
+def score_uploaded_csv(csv_file):
+    total_rows = count_rows(csv_file)
+    progress = st.progress(0.0, text="Scoring patients...")
+    with tempfile.NamedTemporaryFile("w", suffix=".csv", newline="", delete=False) as output_file:
+        results_path = output_file.name
+        try:
+            for scored in score_csv(csv_file, output_file):
+                progress.progress(min(scored / max(total_rows, 1), 1.0), text=f"Scored {scored:,} / {total_rows:,} patients")
+        except ValueError as error:
+            st.error(str(error))
+            results_path = None
+    if results_path is None:
+        os.remove(output_file.name)
+        return
+    st.success(f"Scored {total_rows:,} patients.")
+    with open(results_path, "rb") as results:
+        st.download_button("Download results CSV", results, file_name="stroke_predictions.csv", mime="text/csv")
+    os.remove(results_path)
+
+
+mode = st.radio("Mode", ("Single patient", "Bulk CSV"), horizontal=True)
+
+if mode == "Bulk CSV":
+    st.subheader("Score a CSV of patients")
+    st.markdown("The file must contain the columns: " + ", ".join(f"`{column}`" for column in FEATURES) + ".")
+    csv_file = st.file_uploader("Upload a CSV file", type=["csv"])
+    if csv_file is not None and st.button("Score file"):
+        score_uploaded_csv(csv_file)
+else:
+    # Input form
+    with st.form(key='prediction_form'):
+        st.subheader("Input Information")
+        gender = st.radio("Gender", ("Male", "Female", "Other"), horizontal=True)
+        age = st.slider("Age", 0, 100, 50)
+        hypertension = st.radio("Hypertension", ("No", "Yes"), horizontal=True)
+        heart_disease = st.radio("Heart disease", ("No", "Yes"), horizontal=True)
+        married = st.radio("Married", ("No", "Yes"), horizontal=True)
+        work_type = st.selectbox("Work type", ("Children", "Govt_job", "Never_worked", "Private", "Self-employed"))
+        residence_type = st.radio("Residence type", ("Rural", "Urban"), horizontal=True)
+        avg_glucose_level = st.number_input("Average Glucose Level", 0.0, 500.0, 100.0, 0.1)
+        smoking_status = st.selectbox("Smoking Status", ("Formerly smoked", "Never smoked", "Smokes", "Unknown"))
     
-    submit_button = st.form_submit_button("Predict")
+        submit_button = st.form_submit_button("Predict")
 
-# Prediction logic
-if submit_button:
-    input_data = {
-        'gender': gender,
-        'age': age,
-        'hypertension': 1 if hypertension == "Yes" else 0,
-        'heart_disease': 1 if heart_disease == "Yes" else 0,
-        'ever_married': married,
-        'work_type': work_type,
-        'Residence_type': residence_type,
-        'avg_glucose_level': avg_glucose_level,
-        'smoking_status': smoking_status
-    }
+    # Prediction logic
+    if submit_button:
+        input_data = {
+            'gender': gender,
+            'age': age,
+            'hypertension': 1 if hypertension == "Yes" else 0,
+            'heart_disease': 1 if heart_disease == "Yes" else 0,
+            'ever_married': married,
+            'work_type': work_type,
+            'Residence_type': residence_type,
+            'avg_glucose_level': avg_glucose_level,
+            'smoking_status': smoking_status
+        }
     
-    prediction = predict_stroke_risk(input_data)
+        prediction = predict_stroke_risk(input_data)
     
-    col1, col2, col3 = st.columns(3)
-    with col2:  # Centering the output
-        if prediction == 1:
-            st.error("⚠️ High Stroke Risk")
-            st.markdown("### Consult a healthcare professional for further evaluation and advice.")
-            st.markdown("[Learn More About Stroke Prevention](https://www.stroke.org/en/about-stroke/stroke-prevention)")
-        else:
-            st.success("✅ Low Stroke Risk")
-            st.balloons()
-            st.markdown("### Continue to maintain a healthy lifestyle.")
+        col1, col2, col3 = st.columns(3)
+        with col2:  # Centering the output
+            if prediction == 1:
+                st.error("⚠️ High Stroke Risk")
+                st.markdown("### Consult a healthcare professional for further evaluation and advice.")
+                st.markdown("[Learn More About Stroke Prevention](https://www.stroke.org/en/about-stroke/stroke-prevention)")
+            else:
+                st.success("✅ Low Stroke Risk")
+                st.balloons()
+                st.markdown("### Continue to maintain a healthy lifestyle.")
 
 # Footer
 st.markdown("---")
@@ -1,17 +1,17 @@
 import streamlit as st
-import pickle
-import pandas as pd
-
-# Load the saved model from the pickle file
-with open("pages/xgboost_heart_disease_model.sav", "rb") as file:
-    model = pickle.load(file)
+from inference import heart
+from inference.batching import get_batcher
+from inference.ui import sidebar_model_stats
 
 # Streamlit page configuration
 st.set_page_config(page_title="Heart Disease Risk Prediction", page_icon=":heart:", layout="wide")
 
-# Define a function to predict heart disease risk
-def predict_heart_disease_risk(Age, Sex, BP, Cholesterol, FBS_over_120, EKG_results, Max_HR, Exercise_angina, ST_depression, Slope_of_ST, Number_of_vessels_fluro, Thallium, Chest_pain_type_2, Chest_pain_type_3, Chest_pain_type_4):
-    input_data = {
+# Load the saved model through the shared registry (once per process)
+heart.load()
+
+# Collect the inputs under the column names the model was trained on
+def make_input_data(Age, Sex, BP, Cholesterol, FBS_over_120, EKG_results, Max_HR, Exercise_angina, ST_depression, Slope_of_ST, Number_of_vessels_fluro, Thallium, Chest_pain_type_2, Chest_pain_type_3, Chest_pain_type_4):
+    return {
         'Age': Age,
         'Sex': Sex,
         'BP': BP,
@@ -28,9 +28,12 @@ def predict_heart_disease_risk(Age, Sex, BP, Cholesterol, FBS_over_120, EKG_resu
         'Chest pain type_3': Chest_pain_type_3,
         'Chest pain type_4': Chest_pain_type_4
     }
-    input_df = pd.DataFrame([input_data])
-    prediction = model.predict(input_df)
-    return prediction[0]
+
+# Define a function to predict heart disease risk
+def predict_heart_disease_risk(*inputs):
+    input_data = make_input_data(*inputs)
+    # Concurrent sessions are merged into one vectorized call by the micro-batcher
+    return get_batcher("heart").predict(input_data)["prediction"]
 
 # Header Image
 col1, col2, col3 = st.columns([1, 2, 1])
@@ -51,6 +54,7 @@ st.sidebar.info("""
     If you require professional medical advice or assistance, 
     please contact a healthcare provider immediately.
 """)
+sidebar_model_stats(heart.model_names())
 
 # Input fields
 st.subheader("Your Details")
@@ -80,9 +84,30 @@ Chest_pain_type_2 = st.checkbox("Atypical Angina")
 Chest_pain_type_3 = st.checkbox("Non-Anginal Pain")
 Chest_pain_type_4 = st.checkbox("Asymptomatic")
 
+inputs = (Age, Sex, BP, Cholesterol, FBS_over_120, EKG_results, Max_HR, Exercise_angina, ST_depression, Slope_of_ST, Number_of_vessels_fluro, Thallium, Chest_pain_type_2, Chest_pain_type_3, Chest_pain_type_4)
+
+# What-if curves: risk as one input sweeps its slider range with the others fixed, updated live
+st.subheader("What If?")
+st.markdown("How the predicted risk changes as each measurement moves, with everything else kept as entered above:")
+curves = heart.risk_curves(make_input_data(*inputs))
+for column, (feature, (values, risk)) in zip(st.columns(len(curves)), curves.items()):
+    with column:
+        # A plain Vega-Lite spec renders far faster than st.line_chart, which rebuilds an Altair chart each rerun.
+        # The points go inline, so the page needs no pandas at import.
+        st.vega_lite_chart(spec={
+            "data": {"values": [{"value": float(x), "risk": float(y)} for x, y in zip(values, risk)]},
+            "title": feature,
+            "height": 180,
+            "mark": "line",
+            "encoding": {
+                "x": {"field": "value", "type": "quantitative", "title": feature, "scale": {"zero": False}},
+                "y": {"field": "risk", "type": "quantitative", "title": "Risk", "axis": {"format": "%"}},
+            },
+        }, use_container_width=True)
+
 # Prediction button
 if st.button("Predict Heart Disease Risk"):
-    result = predict_heart_disease_risk(Age, Sex, BP, Cholesterol, FBS_over_120, EKG_results, Max_HR, Exercise_angina, ST_depression, Slope_of_ST, Number_of_vessels_fluro, Thallium, Chest_pain_type_2, Chest_pain_type_3, Chest_pain_type_4)
+    result = predict_heart_disease_risk(*inputs)
     result_text = "High" if result == 1 else "Low"
     if result == 1:
         st.error(f"Risk of Heart Disease: {result_text}")
@@ -1,16 +1,14 @@
 import streamlit as st
-import numpy as np
-import pandas as pd
-import tensorflow as tf
-from tensorflow.keras.preprocessing import image
-import os
+from inference import xray
+from inference.registry import get_model
+from inference.xray import count_zip_images, iter_zip_images, predict_images
+from inference.ui import sidebar_cache_stats, sidebar_model_stats
 
 # Streamlit page configuration
 st.set_page_config(page_title="Chest X-Ray Pneumonia Detection", page_icon=":hospital:", layout="wide")
 
-# Load the pre-trained model from the .h5 file
-model_path = os.path.join("pages", "ANN_ChestXRay_model.h5")
-model = tf.keras.models.load_model(model_path)
+# Get the pre-trained model (Keras or its quantized TFLite conversion) from the shared registry
+model = get_model(xray.model_names()[0])
 
 # Header Image
 col1, col2, col3 = st.columns([1, 2, 1])
@@ -31,28 +29,49 @@ st.sidebar.title("Need Assistance?")
 st.sidebar.info("""
     If you have health concerns or symptoms, please consult a healthcare professional immediately.
 """)
+sidebar_model_stats(xray.model_names())
+sidebar_cache_stats(xray.cache_stats())
 
-# File uploader
-uploaded_file = st.file_uploader("Upload a chest X-ray image", type=["jpg", "jpeg", "png"])
+mode = st.radio("Mode", ("Single image", "Batch (zip of images)"), horizontal=True)
 
-if uploaded_file is not None:
-    # Display the uploaded image
-    st.image(uploaded_file, caption="Uploaded X-Ray Image", use_column_width=True)
-    
-    # Preprocess the uploaded image
-    img = image.load_img(uploaded_file, target_size=(150, 150))
-    img = image.img_to_array(img)
-    img = np.expand_dims(img, axis=0)
-    
-    # Make predictions
-    prediction = model.predict(img)
-    
-    # Display results with a custom message
-    if prediction > 0.5:
-        st.error("⚠️ Prediction: Pneumonia Detected. Please consult with a medical professional for further evaluation and guidance.")
-    else:
-        st.success("✅ Prediction: No Pneumonia Detected. However, for peace of mind, please verify with a healthcare provider.")
-        st.balloons()
+if mode == "Single image":
+    # File uploader
+    uploaded_file = st.file_uploader("Upload a chest X-ray image", type=["jpg", "jpeg", "png"])
+
+    if uploaded_file is not None:
+        # Display the uploaded image
+        st.image(uploaded_file, caption="Uploaded X-Ray Image", use_column_width=True)
+
+        # Reruns and re-uploads of the same image are answered from the cache;
+        # otherwise decode, resize and predict in a batch shared with concurrent sessions
+        prediction = xray.predict_image(uploaded_file.getvalue())
+
+        # Display results with a custom message
+        if prediction["error"] is not None:
+            st.error(f"Could not read the uploaded image: {prediction['error']}")
+        elif prediction["probability"] > 0.5:
+            st.error("⚠️ Prediction: Pneumonia Detected. Please consult with a medical professional for further evaluation and guidance.")
+        else:
+            st.success("✅ Prediction: No Pneumonia Detected. However, for peace of mind, please verify with a healthcare provider.")
+            st.balloons()
+else:
+    # Batch mode: images are decoded in parallel and sent to the model in fixed-size batches
+    zip_file = st.file_uploader("Upload a zip archive of chest X-ray images", type=["zip"])
+
+    if zip_file is not None and st.button("Run batch prediction"):
+        # pandas is only needed for the results table
+        import pandas as pd
+
+        total = count_zip_images(zip_file)
+        progress = st.progress(0.0, text="Analysing images...")
+        results = predict_images(
+            iter_zip_images(zip_file),
+            model=model,
+            progress=lambda done: progress.progress(min(done / max(total, 1), 1.0), text=f"Analysed {done} / {total} images"),
+        )
+        results_df = pd.DataFrame(results, columns=["file", "prediction", "probability", "error"])
+        st.dataframe(results_df, use_container_width=True)
+        st.download_button("Download results CSV", results_df.to_csv(index=False), file_name="xray_predictions.csv", mime="text/csv")
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,14 @@
+"""The dict-to-NumPy encoders must produce exactly what the scikit-learn transforms they replace produce."""
+import pytest
+
+from inference.encoders import verify
+
+
+@pytest.fixture(scope="module")
+def parity():
+    return verify(n_samples=2000)
+
+
+@pytest.mark.parametrize("model", ["stroke", "cancer", "heart"])
+def test_encoder_matches_sklearn_transform(parity, model):
+    assert parity[model]
@@ -0,0 +1,14 @@
+"""Headless, reproducible retraining of the models the pages load.
+
+Each notebook's training recipe as a subcommand, without the plotting:
+
+    python -m training svm-cancer
+    python -m training rf-stroke --data healthcare-dataset-stroke-data.csv
+    python -m training xgb-heart --data Heart_Disease_Prediction.csv
+    python -m training cnn-xray --train-dir chest_xray/train --test-dir chest_xray/test
+
+Cleaned datasets are snapshotted as Parquet or Feather under `--cache-dir`,
+keyed by the source file's fingerprint, so repeated runs skip CSV parsing.
+Artifacts are written to `--out` (pages/ by default) under the file names
+the app already reads.
+"""
@@ -0,0 +1,61 @@
+"""Breast cancer SVM, as in SVM_Cancer_Classification.ipynb.
+
+Writes `SVM_cancer.sav` (the best SVC), `scaler.pkl` and, unless disabled,
+the NumPy engine export `svm_cancer_engine.npz` built from them.
+"""
+import os
+
+from inference.cancer import FEATURES
+from training.common import evaluate, run_search, save_pickle
+from training.datasets import load_cancer
+
+PARAM_SPACE = {
+    "C": (1e-6, 1e+6, "log-uniform"),
+    "kernel": ["linear", "poly", "rbf", "sigmoid"],
+    "degree": (1, 5),
+    "gamma": (1e-6, 1e+1, "log-uniform"),
+}
+TEST_SIZE = 0.20
+SPLIT_SEED = 5
+# Kernel SVMs have no iteration budget, so successive halving grows the training rows
+HALVING_RESOURCE = "n_samples"
+
+
+def train(out_dir, cache_dir, fmt="parquet", n_iter=32, cv=5, n_jobs=-1, seed=42, derived=True,
+          **search_options):
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.svm import SVC
+
+    frame, snapshot_path, cached = load_cancer(cache_dir, fmt)
+    X = frame.drop(columns=["target"])
+    if list(X.columns) != FEATURES:
+        raise ValueError("Cleaned cancer columns no longer match inference.cancer.FEATURES")
+    y = frame["target"]
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=SPLIT_SEED)
+
+    # Fitted on a bare array, like the shipped scaler; inference passes matrices in FEATURES order
+    scaler = StandardScaler()
+    X_train = scaler.fit_transform(X_train.to_numpy())
+    X_test = scaler.transform(X_test.to_numpy())
+
+    search, search_info = run_search(SVC(class_weight="balanced"), PARAM_SPACE, X_train, y_train, n_iter, cv, n_jobs,
+                                     seed, resource=HALVING_RESOURCE, **search_options)
+    model = search.best_estimator_
+
+    artifacts = {
+        "model": save_pickle(model, os.path.join(out_dir, "SVM_cancer.sav")),
+        "scaler": save_pickle(scaler, os.path.join(out_dir, "scaler.pkl")),
+    }
+    if derived:
+        from inference.svm_engine import ENGINE_FILE, export_svm
+
+        artifacts["engine"] = os.path.join(out_dir, ENGINE_FILE)
+        export_svm(model, scaler, artifacts["engine"], FEATURES)
+    return {
+        "snapshot": snapshot_path,
+        "snapshot_cached": cached,
+        **search_info,
+        "test": evaluate("svm-cancer", y_test, model.predict(X_test), ["Malignant", "Benign"]),
+        "artifacts": artifacts,
+    }
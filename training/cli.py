@@ -0,0 +1,134 @@
+"""Command line entry point: one subcommand per model."""
+import argparse
+import importlib
+import json
+import os
+import time
+
+from inference.registry import PAGES_DIR
+from training.common import write_report
+from training.datasets import DEFAULT_CACHE_DIR, FORMATS
+from training.search import N_POINTS, STORE_FILE
+from training.streaming import SAMPLE_SIZE
+from training.xgb_cv import EARLY_STOPPING_ROUNDS
+
+
+def _add_common(parser):
+    parser.add_argument("--out", default=PAGES_DIR, help="directory the artifacts are written to (default: pages/)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="where cleaned dataset snapshots are kept")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-derived", dest="derived", action="store_false",
+                        help="do not regenerate the engine exports derived from the model")
+    parser.add_argument("--report", help="also write the training report to this JSON file")
+
+
+def _add_search(parser):
+    parser.add_argument("--format", choices=sorted(FORMATS), default="parquet", help="snapshot file format")
+    parser.add_argument("--n-iter", type=int, default=32, help="BayesSearchCV iterations")
+    parser.add_argument("--cv", type=int, default=5)
+    parser.add_argument("--n-jobs", type=int, default=-1, help="search worker processes (-1: one per CPU)")
+    parser.add_argument("--search", dest="search_method", choices=["parallel", "halving", "bayes"],
+                        default="parallel",
+                        help="parallel, resumable Bayesian search (default), successive halving, or the notebook's "
+                             "BayesSearchCV")
+    parser.add_argument("--baseline", action="store_true",
+                        help="also run the notebook's BayesSearchCV and report its wall time alongside")
+    parser.add_argument("--n-points", type=int, default=N_POINTS, help="points proposed per search round")
+    parser.add_argument("--trial-store", help=f"SQLite trial store (default: <cache-dir>/{STORE_FILE})")
+    parser.add_argument("--no-trial-store", dest="use_trial_store", action="store_false",
+                        help="do not reuse or record cross-validated trials")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m training", description="Train the diagnosis models headlessly.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cancer = commands.add_parser("svm-cancer", help="breast cancer SVM (data ships with scikit-learn)")
+    _add_common(cancer)
+    _add_search(cancer)
+
+    for name, help_text, data_help in (
+        ("rf-stroke", "stroke random forest", "healthcare-dataset-stroke-data.csv"),
+        ("xgb-heart", "heart disease XGBoost", "Heart_Disease_Prediction.csv"),
+    ):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--data", required=True, help=data_help)
+        command.add_argument("--chunk-size", type=int,
+                             help="stream the CSV this many rows at a time instead of loading it (out-of-core)")
+        command.add_argument("--sample-size", type=int, default=SAMPLE_SIZE,
+                             help="rows sampled for the hyperparameter search when streaming")
+        _add_common(command)
+        _add_search(command)
+        if name == "xgb-heart":
+            command.add_argument("--early-stopping-rounds", type=int, default=EARLY_STOPPING_ROUNDS,
+                                 help="rounds without improvement on an inner holdout before a parallel-search trial "
+                                      "stops boosting (0: boost all n_estimators)")
+
+    xray = commands.add_parser("cnn-xray", help="pneumonia CNN")
+    xray.add_argument("--train-dir", required=True, help="chest_xray/train (one folder per class)")
+    xray.add_argument("--test-dir", required=True, help="chest_xray/test")
+    xray.add_argument("--learning-rate", type=float, help="skip keras-tuner and train with this learning rate")
+    xray.add_argument("--epochs", type=int, default=3)
+    xray.add_argument("--max-trials", type=int, default=3, help="keras-tuner trials")
+    xray.add_argument("--tuner-workers", type=int, default=1,
+                      help="keras-tuner trials run at once, each in its own process with a share of the cores")
+    xray.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                      help="decode threads when building the image caches")
+    xray.add_argument("--student", action="store_true",
+                      help="distill a compact student from the CNN already in --out instead of training the CNN")
+    xray.add_argument("--width", type=float, default=0.5, help="student channel multiplier")
+    xray.add_argument("--temperature", type=float, default=4.0, help="distillation temperature")
+    _add_common(xray)
+    return parser
+
+
+def run(args):
+    # Before any training: a missing output directory must not surface only when the artifacts are saved
+    os.makedirs(args.out, exist_ok=True)
+    common = {"out_dir": args.out, "cache_dir": args.cache_dir, "seed": args.seed, "derived": args.derived}
+    if args.command == "cnn-xray":
+        # Imported only here: it pulls in TensorFlow
+        from training import xray
+
+        if args.student:
+            return xray.distill(args.train_dir, args.test_dir, args.out, args.cache_dir, width=args.width,
+                                temperature=args.temperature, epochs=args.epochs, seed=args.seed, workers=args.workers)
+        return xray.train(args.train_dir, args.test_dir, learning_rate=args.learning_rate, epochs=args.epochs,
+                          max_trials=args.max_trials, workers=args.workers, tuner_workers=args.tuner_workers,
+                          **common)
+    trial_store = None
+    if args.use_trial_store:
+        trial_store = args.trial_store or os.path.join(args.cache_dir, STORE_FILE)
+    search = {"fmt": args.format, "n_iter": args.n_iter, "cv": args.cv, "n_jobs": args.n_jobs,
+              "search_method": args.search_method, "baseline": args.baseline}
+    if args.search_method == "parallel":
+        search.update(n_points=args.n_points, trial_store=trial_store)
+    module = importlib.import_module({"svm-cancer": "training.cancer", "rf-stroke": "training.stroke",
+                                      "xgb-heart": "training.heart"}[args.command])
+    if args.command == "svm-cancer":
+        return module.train(**common, **search)
+    if args.command == "xgb-heart":
+        search["early_stopping_rounds"] = args.early_stopping_rounds
+    if args.chunk_size:
+        # Nothing is snapshotted when the table does not fit in memory
+        del search["fmt"]
+        return module.train_out_of_core(args.data, chunk_size=args.chunk_size, sample_size=args.sample_size,
+                                        **common, **search)
+    return module.train(args.data, **common, **search)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    start = time.perf_counter()
+    report = run(args)
+    report["command"] = args.command
+    report["seconds"] = round(time.perf_counter() - start, 1)
+    keys = ("chunks", "best_params", "cv_score", "search_seconds", "trials", "trials_reused", "rounds", "learning_rate",
+            "hyperparameters", "params", "teacher_params")
+    summary = {key: report[key] for key in keys if key in report}
+    print(json.dumps(summary, indent=2, default=str))
+    for name, path in report["artifacts"].items():
+        print(f"Wrote {name}: {path}")
+    print(f"Finished {args.command} in {report['seconds']} s")
+    if args.report:
+        write_report(args.report, report)
@@ -0,0 +1,199 @@
+"""Helpers shared by the training subcommands."""
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+
+from inference.registry import PAGES_DIR
+
+REPO_ROOT = os.path.dirname(PAGES_DIR)
+
+
+def _replace(path, write):
+    # Write beside the target and rename, so the app never loads a half-written artifact
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = path + ".tmp"
+    write(temp_path)
+    os.replace(temp_path, path)
+    return path
+
+
+def save_pickle(obj, path):
+    def write(temp_path):
+        with open(temp_path, "wb") as file:
+            pickle.dump(obj, file)
+    return _replace(path, write)
+
+
+def check_loadable(path, forbidden=("training", "imblearn")):
+    """Unpickle `path` in a fresh interpreter where the `forbidden` packages cannot be imported.
+
+    The app loads artifacts without the training code or its extra
+    dependencies installed; an artifact that still references them fails
+    here instead of in the app.
+    """
+    import subprocess
+    import sys
+
+    script = (
+        "import importlib.abc, joblib, sys\n"
+        f"forbidden = {tuple(forbidden)!r}\n"
+        "class Block(importlib.abc.MetaPathFinder):\n"
+        "    def find_spec(self, name, path=None, target=None):\n"
+        "        if name.split('.')[0] in forbidden:\n"
+        "            raise ImportError(f'{name} is not available to the app')\n"
+        "sys.meta_path.insert(0, Block())\n"
+        "joblib.load(sys.argv[1])\n"
+    )
+    # -I: no PYTHONPATH, and neither the working directory nor the repo on sys.path
+    result = subprocess.run([sys.executable, "-I", "-c", script, path], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{path} cannot be loaded without {', '.join(forbidden)}:\n{result.stderr.strip()}")
+    return path
+
+
+def save_joblib(obj, path):
+    from joblib import dump
+    return _replace(path, lambda temp_path: dump(obj, temp_path))
+
+
+def bayes_search(estimator, param_space, n_iter, cv, n_jobs, seed):
+    """BayesSearchCV as the notebooks configure it, seeded so reruns pick the same trials."""
+    from skopt import BayesSearchCV
+
+    return BayesSearchCV(estimator, param_space, n_iter=n_iter, cv=cv, n_jobs=n_jobs, random_state=seed)
+
+
+HALVING_FACTOR = 3
+
+
+def to_distributions(param_space):
+    """A skopt search space as the scipy distributions and lists the randomized searches sample from."""
+    from scipy.stats import loguniform, randint, uniform
+    from skopt.space import Categorical, Integer, check_dimension
+
+    distributions = {}
+    for name, spec in param_space.items():
+        dimension = check_dimension(spec)
+        if isinstance(dimension, Categorical):
+            distributions[name] = list(dimension.categories)
+        elif isinstance(dimension, Integer):
+            distributions[name] = randint(dimension.low, dimension.high + 1)
+        elif dimension.prior == "log-uniform":
+            distributions[name] = loguniform(dimension.low, dimension.high)
+        else:
+            distributions[name] = uniform(dimension.low, dimension.high - dimension.low)
+    return distributions
+
+
+def halving_search(estimator, param_space, n_iter, cv, n_jobs, seed, resource="n_samples"):
+    """HalvingRandomSearchCV over the same space, growing `resource` by HALVING_FACTOR each round.
+
+    `resource` is "n_samples" (rows of each training fold) or a parameter of
+    the space such as "n_estimators", whose upper bound becomes the final
+    round's budget. Samples as many candidates as BayesSearchCV's n_iter, but
+    only the best third of each round goes on to the next, larger budget.
+    """
+    from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+    from sklearn.model_selection import HalvingRandomSearchCV
+
+    if resource == "n_samples":
+        budget = {"max_resources": "auto", "min_resources": "smallest"}
+    else:
+        # Sized so the last round trains candidates at (nearly) the top of the parameter's range
+        budget = {"max_resources": to_distributions({resource: param_space[resource]})[resource].support()[1],
+                  "min_resources": "exhaust"}
+    distributions = to_distributions({name: spec for name, spec in param_space.items() if name != resource})
+    return HalvingRandomSearchCV(estimator, distributions, n_candidates=n_iter,
+                                 factor=HALVING_FACTOR, resource=resource, cv=cv, n_jobs=n_jobs, random_state=seed,
+                                 **budget)
+
+
+def make_search(estimator, param_space, n_iter, cv, n_jobs, seed, search_method="parallel", n_points=None,
+                trial_store=None, resource="n_samples", cross_validation=None):
+    """The search a trainer fits.
+
+    "parallel" is `training.search.ParallelBayesSearch`, resuming from the
+    SQLite `trial_store` path if one is given and scoring trials with
+    `cross_validation` (a `training.search.CrossValidation`); "halving" is `halving_search`
+    over `resource`; "bayes" is the notebooks' BayesSearchCV.
+    """
+    if search_method == "bayes":
+        return bayes_search(estimator, param_space, n_iter, cv, n_jobs, seed)
+    if search_method == "halving":
+        return halving_search(estimator, param_space, n_iter, cv, n_jobs, seed, resource)
+    from training.search import N_POINTS, ParallelBayesSearch, TrialStore
+
+    return ParallelBayesSearch(estimator, param_space, n_iter=n_iter, cv=cv, n_jobs=n_jobs,
+                               n_points=n_points or N_POINTS, random_state=seed,
+                               store=None if trial_store is None else TrialStore(trial_store),
+                               cross_validation=cross_validation)
+
+
+def search_artifact(search):
+    """What gets pickled: BayesSearchCV objects whole, as the notebooks did; otherwise the refitted best model."""
+    from skopt import BayesSearchCV
+
+    return search if isinstance(search, BayesSearchCV) else search.best_estimator_
+
+
+def search_report(search):
+    # Randomized searches hand out numpy scalars
+    best_params = {name: value.item() if isinstance(value, np.generic) else value
+                   for name, value in search.best_params_.items()}
+    report = {"best_params": best_params, "cv_score": float(search.best_score_)}
+    if hasattr(search, "trials_"):
+        report["trials"] = len(search.trials_)
+        report["trials_reused"] = search.n_reused_
+    if hasattr(search, "n_iterations_"):
+        report["rounds"] = search.n_iterations_
+        report["candidates"] = search.n_candidates_[0]
+        report["resources"] = [int(value) for value in search.n_resources_]
+    return report
+
+
+def run_search(estimator, param_space, X, y, n_iter, cv, n_jobs, seed, search_method="parallel", baseline=False,
+               **options):
+    """Fit `make_search(...)` on X, y and time it; returns (search, report).
+
+    With `baseline`, the notebooks' BayesSearchCV is also fitted on the same
+    data and budget, and its wall time and score are reported next to it.
+    """
+    from sklearn.base import clone
+
+    search = make_search(estimator, param_space, n_iter, cv, n_jobs, seed, search_method, **options)
+    start = time.perf_counter()
+    search.fit(X, y)
+    report = {"search": search_method, **search_report(search), "search_seconds": time.perf_counter() - start}
+    print(f"{search_method} search: {report['search_seconds']:.1f} s, best CV score {report['cv_score']:.4f}")
+    if baseline and search_method != "bayes":
+        reference = bayes_search(clone(estimator), param_space, n_iter, cv, n_jobs, seed)
+        start = time.perf_counter()
+        reference.fit(X, y)
+        report["baseline"] = {"search": "bayes", **search_report(reference),
+                              "search_seconds": time.perf_counter() - start}
+        print(f"bayes search (baseline): {report['baseline']['search_seconds']:.1f} s, "
+              f"best CV score {report['baseline']['cv_score']:.4f}")
+    return search, report
+
+
+def evaluate(name, y_true, y_pred, target_names=None, sample_weight=None):
+    """Print the notebook's classification report and return it as a dict."""
+    from sklearn.metrics import classification_report, confusion_matrix
+
+    labels = list(range(len(target_names))) if target_names is not None else None
+    options = {"labels": labels, "target_names": target_names, "sample_weight": sample_weight, "zero_division": 0}
+    confusion = confusion_matrix(y_true, y_pred, labels=labels, sample_weight=sample_weight).astype(int)
+    print(f"{name} test set:")
+    print(classification_report(y_true, y_pred, **options))
+    print(f"Confusion matrix:\n{confusion}")
+    report = classification_report(y_true, y_pred, output_dict=True, **options)
+    report["confusion_matrix"] = confusion.tolist()
+    return report
+
+
+def write_report(path, report):
+    with open(path, "w") as file:
+        json.dump(report, file, indent=2, default=str)
@@ -0,0 +1,125 @@
+"""Cleaned training tables, cached as typed columnar snapshots.
+
+Each loader applies the cleaning steps of its notebook once and stores the
+result as a Parquet (or Feather) file named after the dataset, the cleaning
+version and a hash of the source file. Later runs read the snapshot
+instead of re-parsing and re-cleaning the CSV. A changed source file or a
+bumped cleaning version produces a new snapshot name, so stale data is
+never read.
+"""
+import hashlib
+import os
+
+import numpy as np
+
+from training.common import REPO_ROOT
+
+DEFAULT_CACHE_DIR = os.path.join(REPO_ROOT, "data", "snapshots")
+FORMATS = {"parquet": ".parquet", "feather": ".feather"}
+# Bump when a cleaning function changes so existing snapshots are not reused
+CLEANING_VERSIONS = {"cancer": 1, "stroke": 1, "heart": 1}
+
+# Columns dropped after the correlation analysis in SVM_Cancer_Classification.ipynb
+CANCER_DROPPED = [
+    "mean fractal dimension", "texture error", "symmetry error", "smoothness error",
+    "fractal dimension error", "mean radius", "mean area", "radius error", "area error",
+    "worst radius", "worst area", "mean compactness", "mean concave points",
+]
+STROKE_CATEGORICAL = ["gender", "ever_married", "work_type", "Residence_type", "smoking_status"]
+HEART_DUMMIES = ["Chest pain type", "Heart Disease"]
+
+
+def file_fingerprint(path, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read(path, fmt):
+    import pandas as pd
+
+    return pd.read_parquet(path) if fmt == "parquet" else pd.read_feather(path)
+
+
+def _write(frame, path, fmt):
+    # Written next to the target and renamed, so a crashed run never leaves a truncated snapshot
+    temp_path = path + ".tmp"
+    if fmt == "parquet":
+        frame.to_parquet(temp_path, index=False)
+    else:
+        frame.reset_index(drop=True).to_feather(temp_path)
+    os.replace(temp_path, path)
+
+
+def snapshot(name, source_key, build, cache_dir=DEFAULT_CACHE_DIR, fmt="parquet"):
+    """Return the cleaned frame for `name`, building and caching it on first use.
+
+    Returns (frame, snapshot path, whether it was read from the cache).
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown snapshot format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    path = os.path.join(cache_dir, f"{name}-v{CLEANING_VERSIONS[name]}-{source_key[:16]}{FORMATS[fmt]}")
+    if os.path.exists(path):
+        return _read(path, fmt), path, True
+    frame = build()
+    os.makedirs(cache_dir, exist_ok=True)
+    _write(frame, path, fmt)
+    return frame, path, False
+
+
+def _clean_cancer():
+    import pandas as pd
+    from sklearn.datasets import load_breast_cancer
+
+    cancer = load_breast_cancer()
+    frame = pd.DataFrame(cancer["data"], columns=cancer["feature_names"])
+    frame = frame.drop(columns=CANCER_DROPPED)
+    frame["target"] = cancer["target"].astype(np.int8)
+    return frame
+
+
+def _clean_stroke(csv_path):
+    import pandas as pd
+
+    data = pd.read_csv(csv_path)
+    # Same order as the notebook: impute bmi with its mean, then drop it with the id
+    data["bmi"] = data["bmi"].fillna(data["bmi"].mean())
+    data = data.drop(columns=["id", "bmi"])
+    for column in STROKE_CATEGORICAL:
+        data[column] = data[column].astype("category")
+    return data.astype({"age": np.float64, "hypertension": np.int8, "heart_disease": np.int8,
+                        "avg_glucose_level": np.float64, "stroke": np.int8})
+
+
+def _clean_heart(csv_path):
+    import pandas as pd
+
+    data = pd.read_csv(csv_path)
+    # uint8 dummies, as pandas produced when the shipped model was trained
+    return pd.get_dummies(data, columns=HEART_DUMMIES, drop_first=True, dtype=np.uint8)
+
+
+def load_cancer(cache_dir=DEFAULT_CACHE_DIR, fmt="parquet"):
+    """Breast cancer features kept after the correlation analysis, plus `target`."""
+    import sklearn
+
+    # The data ships inside scikit-learn, so its version identifies the source
+    return snapshot("cancer", hashlib.blake2b(sklearn.__version__.encode(), digest_size=16).hexdigest(),
+                    _clean_cancer, cache_dir, fmt)
+
+
+def load_stroke(csv_path, cache_dir=DEFAULT_CACHE_DIR, fmt="parquet"):
+    """healthcare-dataset-stroke-data.csv without id and bmi, with compact dtypes."""
+    frame, path, cached = snapshot("stroke", file_fingerprint(csv_path), lambda: _clean_stroke(csv_path),
+                                   cache_dir, fmt)
+    # The encoder is fitted on plain string columns, as in the notebook
+    for column in STROKE_CATEGORICAL:
+        frame[column] = frame[column].astype(object)
+    return frame, path, cached
+
+
+def load_heart(csv_path, cache_dir=DEFAULT_CACHE_DIR, fmt="parquet"):
+    """Heart_Disease_Prediction.csv with chest pain type and target one-hot encoded."""
+    return snapshot("heart", file_fingerprint(csv_path), lambda: _clean_heart(csv_path), cache_dir, fmt)
@@ -0,0 +1,145 @@
+"""Heart disease XGBoost classifier, as in XGBoost_HeartDisease.ipynb.
+
+Writes `xgboost_heart_disease_model.sav` (the refitted best classifier, or
+the whole BayesSearchCV object with `--search bayes`) and, unless disabled,
+the native Booster export the app prefers. The parallel search scores
+trials with `training.xgb_cv.BoosterCV`, and the shipped model keeps the
+boosting rounds early stopping found useful.
+"""
+import os
+
+import xgboost as xgb
+
+from inference.heart import FEATURES
+from training.common import evaluate, run_search, save_pickle, search_artifact
+from training.datasets import load_heart
+from training.streaming import (CHUNK_SIZE, SAMPLE_SIZE, BottomKSample, ConfusionCounts, clean_heart_chunk,
+                                read_chunks, split_chunks)
+from training.xgb_cv import EARLY_STOPPING_ROUNDS, MAX_BIN, BoosterCV
+
+PARAM_SPACE = {
+    "n_estimators": (10, 1000),
+    "max_depth": (1, 10),
+    "learning_rate": (0.01, 1.0, "log-uniform"),
+    "subsample": (0.5, 1.0, "uniform"),
+    "colsample_bytree": (0.5, 1.0, "uniform"),
+    "gamma": (0, 5, "uniform"),
+    "min_child_weight": (1, 10),
+}
+TARGET = "Heart Disease_Presence"
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+# Successive halving grows the boosting rounds, up to the 1000 of the space
+HALVING_RESOURCE = "n_estimators"
+
+
+class ChunkIter(xgb.DataIter):
+    """Feeds `(X, y)` chunks from `make_chunks()` to an external-memory DMatrix, re-reading them on `reset`."""
+
+    def __init__(self, make_chunks, cache_prefix):
+        self._make_chunks = make_chunks
+        self._chunks = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self._chunks is None:
+            self._chunks = self._make_chunks()
+        X, y = next(self._chunks, (None, None))
+        if X is None:
+            return False
+        input_data(data=X, label=y)
+        return True
+
+    def reset(self):
+        self._chunks = None
+
+
+def _search_options(early_stopping_rounds, search_options):
+    if early_stopping_rounds and search_options.get("search_method", "parallel") == "parallel":
+        # Trials share quantized fold matrices and stop boosting once an inner holdout stops improving
+        search_options = {**search_options,
+                          "cross_validation": BoosterCV(early_stopping_rounds, random_state=RANDOM_STATE)}
+    return search_options
+
+
+def _save(model, out_dir, derived):
+    artifacts = {"model": save_pickle(model, os.path.join(out_dir, "xgboost_heart_disease_model.sav"))}
+    if derived:
+        from inference.xgb_engine import BOOSTER_FILE, MANIFEST_FILE, export_booster
+
+        artifacts["booster"] = os.path.join(out_dir, BOOSTER_FILE)
+        artifacts["booster_manifest"] = os.path.join(out_dir, MANIFEST_FILE)
+        export_booster(model, artifacts["booster"], artifacts["booster_manifest"])
+    return artifacts
+
+
+def train(csv_path, out_dir, cache_dir, fmt="parquet", n_iter=32, cv=5, n_jobs=-1, seed=42, derived=True,
+          early_stopping_rounds=EARLY_STOPPING_ROUNDS, **search_options):
+    from sklearn.model_selection import train_test_split
+
+    frame, snapshot_path, cached = load_heart(csv_path, cache_dir, fmt)
+    X = frame.drop(columns=[TARGET])
+    if list(X.columns) != FEATURES:
+        raise ValueError("Cleaned heart columns no longer match inference.heart.FEATURES")
+    y = frame[TARGET]
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE)
+
+    search, search_info = run_search(xgb.XGBClassifier(), PARAM_SPACE, X_train, y_train, n_iter, cv, n_jobs, seed,
+                                     resource=HALVING_RESOURCE,
+                                     **_search_options(early_stopping_rounds, search_options))
+    model = search.best_estimator_
+    return {
+        "snapshot": snapshot_path,
+        "snapshot_cached": cached,
+        **search_info,
+        "test": evaluate("xgb-heart", y_test, model.predict(X_test), ["0", "1"]),
+        "artifacts": _save(search_artifact(search), out_dir, derived),
+    }
+
+
+def train_out_of_core(csv_path, out_dir, cache_dir, chunk_size=CHUNK_SIZE, sample_size=SAMPLE_SIZE, n_iter=32, cv=5,
+                      n_jobs=-1, seed=42, derived=True, early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+                      **search_options):
+    """`train` for CSVs larger than memory.
+
+    Hyperparameters are searched on a bounded uniform sample of the training
+    rows. The final model then boosts on an ExtMemQuantileDMatrix fed chunk
+    by chunk through `ChunkIter`: XGBoost sketches the quantiles while
+    streaming and keeps the binned pages in a cache under `cache_dir`, not in
+    memory. The test rows are evaluated in a last streaming pass.
+    """
+    def chunks():
+        return split_chunks(read_chunks(csv_path, chunk_size, clean_heart_chunk), TEST_SIZE, RANDOM_STATE)
+
+    sample = BottomKSample(sample_size, seed)
+    n_chunks = 0
+    for train_chunk, _ in chunks():
+        sample.update(train_chunk)
+        n_chunks += 1
+    sample = sample.frame()
+    search, search_info = run_search(xgb.XGBClassifier(), PARAM_SPACE, sample[FEATURES], sample[TARGET], n_iter, cv,
+                                     n_jobs, seed, resource=HALVING_RESOURCE,
+                                     **_search_options(early_stopping_rounds, search_options))
+    model = search.best_estimator_
+
+    cache_prefix = os.path.join(cache_dir, "xgb_external", "heart")
+    os.makedirs(os.path.dirname(cache_prefix), exist_ok=True)
+    training_chunks = ChunkIter(lambda: ((train[FEATURES], train[TARGET]) for train, _ in chunks()), cache_prefix)
+    params = {name: value for name, value in model.get_xgb_params().items() if value is not None}
+    params.update(tree_method="hist", max_bin=MAX_BIN)
+    matrix = xgb.ExtMemQuantileDMatrix(training_chunks, max_bin=MAX_BIN)
+    booster = xgb.train(params, matrix, num_boost_round=model.n_estimators)
+    # Same classifier settings, with the externally trained trees
+    model.load_model(bytearray(booster.save_raw("ubj")))
+
+    confusion = ConfusionCounts()
+    for _, test_chunk in chunks():
+        confusion.update(test_chunk[TARGET], model.predict(test_chunk[FEATURES]))
+    return {
+        "chunk_size": chunk_size,
+        "chunks": n_chunks,
+        "sample_rows": len(sample),
+        **search_info,
+        "test": confusion.evaluate("xgb-heart", ["0", "1"]),
+        "artifacts": _save(model, out_dir, derived),
+    }
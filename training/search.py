@@ -0,0 +1,299 @@
+"""Parallel, resumable Bayesian hyperparameter search.
+
+BayesSearchCV proposes one point at a time and keeps its results in memory,
+so an interrupted or extended search starts over. `ParallelBayesSearch` asks
+skopt's Optimizer for several points per round and cross-validates them in a
+process pool. Every finished trial goes into a `TrialStore`, a SQLite file
+keyed by the estimator, the data fingerprint and the parameters. Reruns,
+longer searches and restarts tell the optimizer the stored trials first, and
+only evaluate points that have not been scored yet.
+
+    python -m training.search trials.sqlite    # summarise a trial store
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+STORE_FILE = "trials.sqlite"
+N_POINTS = 4
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trials (
+    study TEXT NOT NULL,
+    data TEXT NOT NULL,
+    params TEXT NOT NULL,
+    fold_scores TEXT NOT NULL,
+    mean_score REAL NOT NULL,
+    seconds REAL NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (study, data, params)
+)
+"""
+
+
+def _hash(*parts):
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+    return digest.hexdigest()
+
+
+def data_fingerprint(X, y):
+    """Content hash of a training set; any change in values, dtypes or column names changes it."""
+    import pandas as pd
+
+    parts = []
+    for data in (X, y):
+        if isinstance(data, (pd.DataFrame, pd.Series)):
+            names = list(data.columns) if isinstance(data, pd.DataFrame) else [data.name]
+            parts += [repr(names), repr(list(map(str, np.atleast_1d(data.dtypes)))),
+                      pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes()]
+        else:
+            data = np.ascontiguousarray(data)
+            parts += [repr(data.shape), data.dtype.str, data.tobytes()]
+    return _hash(*parts)
+
+
+def study_key(estimator, cv, scoring=None, cross_validation=None):
+    """Identifies what a trial's score means: the estimator, its fixed parameters and the CV scheme."""
+    params = sorted((name, repr(value)) for name, value in estimator.get_params(deep=False).items())
+    parts = [type(estimator).__module__, type(estimator).__name__, repr(params), repr(cv), repr(scoring)]
+    # Plain cross_val_score keeps the original key, so existing stores stay valid
+    if cross_validation is not None and type(cross_validation) is not CrossValidation:
+        parts.append(repr(cross_validation))
+    return _hash(*parts)
+
+
+def _plain(value):
+    # skopt hands out numpy scalars; the store keys on their JSON form
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def params_key(params):
+    return json.dumps({name: _plain(value) for name, value in params.items()}, sort_keys=True)
+
+
+class TrialStore:
+    """Completed cross-validation trials in a SQLite file. Only the search process writes to it."""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path)
+        with self._connection:
+            self._connection.execute(_SCHEMA)
+
+    def get(self, study, data, params):
+        row = self._connection.execute(
+            "SELECT fold_scores FROM trials WHERE study = ? AND data = ? AND params = ?",
+            (study, data, params_key(params)),
+        ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def put(self, study, data, params, fold_scores, seconds):
+        fold_scores = [float(score) for score in fold_scores]
+        # Committed per trial, so an interrupted search loses at most the trials still running
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO trials VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (study, data, params_key(params), json.dumps(fold_scores), float(np.mean(fold_scores)), seconds,
+                 time.time()),
+            )
+
+    def trials(self, study, data):
+        """[(params, fold_scores)] for one study and dataset, oldest first."""
+        rows = self._connection.execute(
+            "SELECT params, fold_scores FROM trials WHERE study = ? AND data = ? ORDER BY created", (study, data)
+        ).fetchall()
+        return [(json.loads(params), json.loads(scores)) for params, scores in rows]
+
+    def summary(self):
+        return self._connection.execute(
+            "SELECT study, data, COUNT(*), MAX(mean_score), SUM(seconds) FROM trials GROUP BY study, data"
+        ).fetchall()
+
+    def close(self):
+        self._connection.close()
+
+
+class CrossValidation:
+    """How a trial is scored: sklearn's cross_val_score on a clone of the estimator.
+
+    `prepare` runs once in every worker process, so subclasses can build
+    per-fold state there and reuse it across trials; `refit_params` adjusts
+    the best trial's parameters for the final refit. The repr is part of the
+    study key, so trials scored differently are never mixed up.
+    """
+
+    def prepare(self, estimator, X, y, cv, scoring):
+        self.estimator, self.X, self.y, self.cv, self.scoring = estimator, X, y, cv, scoring
+
+    def scores(self, params):
+        from sklearn.base import clone
+        from sklearn.model_selection import cross_val_score
+
+        estimator = clone(self.estimator).set_params(**params)
+        return cross_val_score(estimator, self.X, self.y, cv=self.cv, scoring=self.scoring).tolist()
+
+    def refit_params(self, params):
+        return params
+
+    def __repr__(self):
+        return f"{type(self).__name__}()"
+
+
+# Set once per worker process, so each trial only ships its parameters
+_worker = {}
+
+
+def _init_worker(cross_validation, estimator, X, y, cv, scoring):
+    cross_validation.prepare(estimator, X, y, cv, scoring)
+    _worker["cross_validation"] = cross_validation
+
+
+def _cross_validate(params):
+    start = time.perf_counter()
+    scores = _worker["cross_validation"].scores(params)
+    return [float(score) for score in scores], time.perf_counter() - start
+
+
+class ParallelBayesSearch:
+    """BayesSearchCV's search loop, batched over a process pool and backed by a `TrialStore`.
+
+    Exposes the attributes the trainers read from BayesSearchCV
+    (`best_params_`, `best_score_`, `best_estimator_`), plus `trials_`, one
+    dict per trial with its source: "store" if it was reused, "run" if it was
+    evaluated now.
+    """
+
+    def __init__(self, estimator, search_spaces, n_iter=32, cv=5, n_jobs=-1, n_points=N_POINTS, random_state=None,
+                 store=None, scoring=None, refit=True, cross_validation=None):
+        self.estimator = estimator
+        self.search_spaces = search_spaces
+        self.n_iter = n_iter
+        self.cv = cv
+        self.n_jobs = n_jobs
+        self.n_points = n_points
+        self.random_state = random_state
+        self.store = store
+        self.scoring = scoring
+        self.refit = refit
+        self.cross_validation = cross_validation
+
+    def _workers(self):
+        cpus = os.cpu_count() or 1
+        workers = cpus if self.n_jobs is None or self.n_jobs < 0 else self.n_jobs
+        return max(1, min(workers, self.n_points))
+
+    def fit(self, X, y):
+        from sklearn.base import clone
+        from skopt import Optimizer
+        from skopt.space import check_dimension
+
+        # Same dimension order as BayesSearchCV, which sorts the space by name
+        names = sorted(self.search_spaces)
+        dimensions = [check_dimension(self.search_spaces[name]) for name in names]
+        optimizer = Optimizer(dimensions, base_estimator="GP", random_state=self.random_state)
+        cross_validation = self.cross_validation or CrossValidation()
+        study = study_key(self.estimator, self.cv, self.scoring, cross_validation)
+        data = data_fingerprint(X, y)
+        self.trials_ = []
+
+        def record(params, fold_scores, source):
+            self.trials_.append({"params": params, "mean_score": float(np.mean(fold_scores)),
+                                 "fold_scores": fold_scores, "source": source})
+
+        # Resume: everything already scored for this estimator and data counts towards n_iter
+        if self.store is not None:
+            stored = [(params, scores) for params, scores in self.store.trials(study, data)
+                      if set(params) == set(names) and [params[name] for name in names] in optimizer.space]
+            for params, scores in stored[:self.n_iter]:
+                record(params, scores, "store")
+            if self.trials_:
+                optimizer.tell([[trial["params"][name] for name in names] for trial in self.trials_],
+                               [-trial["mean_score"] for trial in self.trials_])
+
+        workers = self._workers()
+        pool = None
+        if workers > 1 and len(self.trials_) < self.n_iter:
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       initargs=(cross_validation, self.estimator, X, y, self.cv, self.scoring))
+        else:
+            _init_worker(cross_validation, self.estimator, X, y, self.cv, self.scoring)
+        try:
+            while len(self.trials_) < self.n_iter:
+                points = optimizer.ask(n_points=min(self.n_points, self.n_iter - len(self.trials_)))
+                results = self._evaluate_round(points, names, study, data, pool)
+                for params, (scores, source) in zip((dict(zip(names, point)) for point in points), results):
+                    record({name: _plain(value) for name, value in params.items()}, scores, source)
+                optimizer.tell(points, [-float(np.mean(scores)) for scores, _ in results])
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            _worker.clear()
+
+        best = max(self.trials_, key=lambda trial: trial["mean_score"])
+        self.best_score_ = best["mean_score"]
+        if pool is not None:
+            # The prepared state lived in the workers
+            cross_validation.prepare(self.estimator, X, y, self.cv, self.scoring)
+        self.best_params_ = cross_validation.refit_params(best["params"])
+        if self.refit:
+            self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_).fit(X, y)
+        return self
+
+    def _evaluate_round(self, points, names, study, data, pool):
+        results = [None] * len(points)
+        pending = {}
+        for index, point in enumerate(points):
+            params = {name: _plain(value) for name, value in zip(names, point)}
+            scores = None if self.store is None else self.store.get(study, data, params)
+            if scores is not None:
+                # The optimizer can propose a point it has already seen
+                results[index] = (scores, "store")
+            elif pool is None:
+                scores, seconds = _cross_validate(params)
+                self._save(study, data, params, scores, seconds)
+                results[index] = (scores, "run")
+            else:
+                pending[pool.submit(_cross_validate, params)] = (index, params)
+        if pool is not None:
+            for future in as_completed(pending):
+                index, params = pending[future]
+                scores, seconds = future.result()
+                self._save(study, data, params, scores, seconds)
+                results[index] = (scores, "run")
+        return results
+
+    def _save(self, study, data, params, scores, seconds):
+        if self.store is not None:
+            self.store.put(study, data, params, scores, seconds)
+
+    @property
+    def n_reused_(self):
+        return sum(trial["source"] == "store" for trial in self.trials_)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        print("usage: python -m training.search TRIALS.sqlite")
+        return 2
+    store = TrialStore(argv[0])
+    print(f"{'study':<34} {'data':<34} {'trials':>6} {'best':>8} {'cv hours':>9}")
+    for study, data, count, best, seconds in store.summary():
+        print(f"{study:<34} {data:<34} {count:>6} {best:>8.4f} {seconds / 3600:>9.2f}")
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
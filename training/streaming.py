@@ -0,0 +1,127 @@
+"""Chunked ingestion for datasets that do not fit in memory.
+
+The snapshot loaders in `training.datasets` read and clean a whole CSV at
+once. Here the CSV is read `chunk_size` rows at a time and every step works
+per chunk:
+
+- the cleaning is row-local, so a chunk comes out with the same columns and
+  dtypes as the full-table cleaning would give it;
+- the train/test split draws per row from its own seeded stream, so a row
+  lands on the same side in every pass and for any chunk size;
+- `CategoryStats` collects categorical levels for fitting encoders;
+- `BottomKSample` keeps a uniform sample of bounded size for the
+  hyperparameter search;
+- `ConfusionCounts` evaluates a model on the streamed test rows.
+
+Peak memory is one chunk plus the sample.
+"""
+import numpy as np
+
+from training.common import evaluate
+from training.datasets import STROKE_CATEGORICAL
+
+CHUNK_SIZE = 100_000
+SAMPLE_SIZE = 100_000
+
+
+def read_chunks(csv_path, chunk_size=CHUNK_SIZE, clean=None):
+    import pandas as pd
+
+    with pd.read_csv(csv_path, chunksize=chunk_size) as reader:
+        for chunk in reader:
+            yield chunk if clean is None else clean(chunk)
+
+
+def clean_stroke_chunk(chunk):
+    """`training.datasets` stroke cleaning, minus the bmi imputation (bmi is dropped anyway)."""
+    chunk = chunk.drop(columns=["id", "bmi"])
+    for column in STROKE_CATEGORICAL:
+        chunk[column] = chunk[column].astype(object)
+    return chunk.astype({"age": np.float64, "hypertension": np.int8, "heart_disease": np.int8,
+                         "avg_glucose_level": np.float64, "stroke": np.int8})
+
+
+def clean_heart_chunk(chunk):
+    """`training.datasets` heart cleaning with the dummy columns fixed up front.
+
+    get_dummies on a chunk only creates columns for the levels that chunk
+    happens to contain; the full table's columns come from inference.heart.
+    """
+    from inference.heart import FEATURES
+
+    for column in FEATURES:
+        if column.startswith("Chest pain type_"):
+            level = int(column.rsplit("_", 1)[1])
+            chunk[column] = (chunk["Chest pain type"] == level).astype(np.uint8)
+    chunk["Heart Disease_Presence"] = (chunk["Heart Disease"] == "Presence").astype(np.uint8)
+    return chunk.drop(columns=["Chest pain type", "Heart Disease"])
+
+
+def split_chunks(chunks, test_size, seed):
+    """(train, test) parts of each chunk; each row draws once from a stream seeded with `seed`."""
+    random = np.random.default_rng(seed)
+    for chunk in chunks:
+        test = random.random(len(chunk)) < test_size
+        yield chunk[~test], chunk[test]
+
+
+class CategoryStats:
+    """Level counts of categorical columns, accumulated chunk by chunk."""
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.counts = {column: {} for column in self.columns}
+        self.rows = 0
+
+    def update(self, frame):
+        self.rows += len(frame)
+        for column in self.columns:
+            counts = self.counts[column]
+            for level, count in frame[column].value_counts(dropna=True).items():
+                counts[level] = counts.get(level, 0) + int(count)
+
+    def categories(self):
+        """Sorted levels per column, the order OneHotEncoder's `categories_` uses."""
+        return {column: sorted(self.counts[column]) for column in self.columns}
+
+
+class BottomKSample:
+    """Uniform sample without replacement of at most `size` rows from a stream of frames.
+
+    Every row gets a random key and the `size` smallest keys are kept, so
+    the result does not depend on how the stream was chunked.
+    """
+
+    def __init__(self, size=SAMPLE_SIZE, seed=0):
+        self.size = size
+        self._random = np.random.default_rng(seed)
+        self._sample = None
+        self._keys = np.empty(0)
+
+    def update(self, frame):
+        import pandas as pd
+
+        keys = np.concatenate([self._keys, self._random.random(len(frame))])
+        sample = frame if self._sample is None else pd.concat([self._sample, frame])
+        if len(sample) > self.size:
+            keep = np.sort(np.argpartition(keys, self.size - 1)[:self.size])
+            sample, keys = sample.iloc[keep], keys[keep]
+        self._sample, self._keys = sample, keys
+
+    def frame(self):
+        return self._sample.reset_index(drop=True)
+
+
+class ConfusionCounts:
+    """Confusion matrix accumulated over chunks, reported like `training.common.evaluate`."""
+
+    def __init__(self, n_classes=2):
+        self.counts = np.zeros((n_classes, n_classes), dtype=np.int64)
+
+    def update(self, y_true, y_pred):
+        np.add.at(self.counts, (np.asarray(y_true, dtype=np.intp), np.asarray(y_pred, dtype=np.intp)), 1)
+
+    def evaluate(self, name, target_names=None):
+        true, pred = np.indices(self.counts.shape).reshape(2, -1)
+        # Each (true, predicted) pair once, weighted by how often it occurred
+        return evaluate(name, true, pred, target_names, sample_weight=self.counts.reshape(-1))
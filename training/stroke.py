@@ -0,0 +1,206 @@
+"""Stroke random forest, as in RF_Stroke.ipynb.
+
+Writes `rf_model.sav` (the refitted best forest, for every search method) and
+`preprocessing.joblib`. The minority class is oversampled by
+`training.oversample.PartitionedSMOTE` inside each cross-validation fold, as
+the first step of the searched pipeline. Unless disabled, the flat
+forest export is regenerated from them, and so is the decision-region index
+when one was already built, so the app never pairs new models with stale
+exports.
+"""
+import os
+
+import numpy as np
+
+from inference.stroke import FEATURES
+from training.common import check_loadable, evaluate, run_search, save_joblib, save_pickle
+from training.datasets import STROKE_CATEGORICAL, load_stroke
+from training.streaming import (CHUNK_SIZE, SAMPLE_SIZE, BottomKSample, CategoryStats, ConfusionCounts,
+                                clean_stroke_chunk, read_chunks, split_chunks)
+
+PARAM_SPACE = {
+    "n_estimators": (10, 1000),
+    "max_depth": (1, 32),
+    "min_samples_split": (2, 10),
+    "min_samples_leaf": (1, 10),
+}
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+# Successive halving grows the forest: 1000 trees only for the last round
+HALVING_RESOURCE = "model__n_estimators"
+
+
+def make_preprocessor():
+    from sklearn.compose import ColumnTransformer
+    from sklearn.preprocessing import OneHotEncoder
+
+    return ColumnTransformer(
+        transformers=[("cat", OneHotEncoder(sparse_output=False, handle_unknown="ignore"), STROKE_CATEGORICAL)],
+        remainder="passthrough",
+    )
+
+
+def fit_preprocessor(categories):
+    """`make_preprocessor()` fitted from category levels alone, e.g. `streaming.CategoryStats.categories()`.
+
+    OneHotEncoder learns nothing but the sorted levels of each column, so
+    fitting it on one row per level gives the same transformer as fitting
+    it on the full table.
+    """
+    import pandas as pd
+
+    rows = max(len(levels) for levels in categories.values())
+    frame = pd.DataFrame({column: [0.0] * rows for column in FEATURES})
+    for column, levels in categories.items():
+        frame[column] = [levels[row % len(levels)] for row in range(rows)]
+    return make_preprocessor().fit(frame)
+
+
+def one_hot_blocks(preprocessor):
+    """(start, stop) columns of each one-hot encoded feature in `preprocessor`'s output; they come first."""
+    sizes = [len(levels) for levels in preprocessor.named_transformers_["cat"].categories_]
+    bounds = np.cumsum([0] + sizes)
+    return [(int(start), int(stop)) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+def make_oversampler(preprocessor):
+    from training.oversample import PartitionedSMOTE
+
+    return PartitionedSMOTE(one_hot_blocks(preprocessor), random_state=RANDOM_STATE)
+
+
+def _search(preprocessor, X_train, y_train, n_iter, cv, n_jobs, seed, search_options):
+    from imblearn.pipeline import Pipeline
+    from sklearn.ensemble import RandomForestClassifier
+
+    # Oversampling is a pipeline step, so each CV fold resamples its own training rows and scores on real ones
+    pipeline = Pipeline([("smote", make_oversampler(preprocessor)),
+                         ("model", RandomForestClassifier(random_state=RANDOM_STATE))])
+    space = {f"model__{name}": spec for name, spec in PARAM_SPACE.items()}
+    search, search_info = run_search(pipeline, space, preprocessor.transform(X_train), np.asarray(y_train), n_iter,
+                                     cv, n_jobs, seed, resource=HALVING_RESOURCE, **search_options)
+    # The app and the exports read best_estimator_ as the forest; the sampler only matters while fitting
+    search.best_estimator_ = search.best_estimator_.named_steps["model"]
+    return search, search_info
+
+
+def _save(model, preprocessor, out_dir, derived):
+    artifacts = {
+        "model": check_loadable(save_pickle(model, os.path.join(out_dir, "rf_model.sav"))),
+        "preprocessing": save_joblib(preprocessor, os.path.join(out_dir, "preprocessing.joblib")),
+    }
+    if derived:
+        artifacts.update(export_derived(model, preprocessor, out_dir))
+    return artifacts
+
+
+def train(csv_path, out_dir, cache_dir, fmt="parquet", n_iter=32, cv=5, n_jobs=-1, seed=42, derived=True,
+          **search_options):
+    from sklearn.model_selection import train_test_split
+
+    frame, snapshot_path, cached = load_stroke(csv_path, cache_dir, fmt)
+    X = frame[FEATURES]
+    y = frame["stroke"]
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE)
+
+    preprocessor = make_preprocessor().fit(X_train)
+    search, search_info = _search(preprocessor, X_train, y_train, n_iter, cv, n_jobs, seed, search_options)
+    model = search.best_estimator_
+    return {
+        "snapshot": snapshot_path,
+        "snapshot_cached": cached,
+        **search_info,
+        "test": evaluate("rf-stroke", y_test, model.predict(preprocessor.transform(X_test)), ["0", "1"]),
+        # The forest alone, even for BayesSearchCV: the search object keeps the imblearn pipeline in `estimator`
+        # and `cv_results_`, and the app has neither imblearn nor `training` to unpickle it
+        "artifacts": _save(search.best_estimator_, preprocessor, out_dir, derived),
+    }
+
+
+def train_out_of_core(csv_path, out_dir, cache_dir, chunk_size=CHUNK_SIZE, sample_size=SAMPLE_SIZE, n_iter=32, cv=5,
+                      n_jobs=-1, seed=42, derived=True, **search_options):
+    """`train` for CSVs larger than memory, in three streaming passes.
+
+    1. Category levels, chunk count and a bounded uniform sample of the
+       training rows; the preprocessor is fitted from the levels and the
+       hyperparameters are searched on the sample.
+    2. The forest grows with `warm_start`: each chunk fits its share of the
+       trees on its own SMOTE-balanced rows, a subsampled bootstrap of the
+       whole training set.
+    3. The model is evaluated on the streamed test rows.
+    """
+    import pandas as pd
+    from sklearn.base import clone
+
+    def chunks():
+        return split_chunks(read_chunks(csv_path, chunk_size, clean_stroke_chunk), TEST_SIZE, RANDOM_STATE)
+
+    stats = CategoryStats(STROKE_CATEGORICAL)
+    sample = BottomKSample(sample_size, seed)
+    n_chunks = 0
+    for train_chunk, _ in chunks():
+        stats.update(train_chunk)
+        sample.update(train_chunk)
+        n_chunks += 1
+    preprocessor = fit_preprocessor(stats.categories())
+    sample = sample.frame()
+    search, search_info = _search(preprocessor, sample[FEATURES], sample["stroke"], n_iter, cv, n_jobs, seed,
+                                  search_options)
+
+    model = clone(search.best_estimator_).set_params(warm_start=True)
+    n_trees = search.best_estimator_.n_estimators
+    shares = [len(part) for part in np.array_split(np.arange(n_trees), n_chunks)]
+
+    def grow(frame, n):
+        X_chunk, y_chunk = make_oversampler(preprocessor).fit_resample(preprocessor.transform(frame[FEATURES]),
+                                                                       frame["stroke"])
+        model.set_params(n_estimators=len(getattr(model, "estimators_", [])) + n).fit(X_chunk, y_chunk)
+
+    owed, carried, last = 0, None, None
+    for (train_chunk, _), share in zip(chunks(), shares):
+        owed += share
+        if owed == 0:
+            # More chunks than trees: this one grows none
+            continue
+        if carried is not None:
+            train_chunk = pd.concat([carried, train_chunk])
+        minority = train_chunk["stroke"].value_counts().reindex([0, 1], fill_value=0).min()
+        # SMOTE needs two minority rows; a chunk without them is carried into the next one
+        if minority < 2:
+            carried = train_chunk
+            continue
+        carried = None
+        grow(train_chunk, owed)
+        owed, last = 0, train_chunk
+    if last is None:
+        raise ValueError("No chunk had two rows of each class; lower the stroke rate or raise --chunk-size")
+    if carried is not None:
+        # The trailing chunks never reached two minority rows: grow their trees on them and the last fitted chunk
+        grow(pd.concat([last, carried]), owed)
+    model.set_params(warm_start=False)
+
+    confusion = ConfusionCounts()
+    for _, test_chunk in chunks():
+        confusion.update(test_chunk["stroke"], model.predict(preprocessor.transform(test_chunk[FEATURES])))
+    return {
+        "chunk_size": chunk_size,
+        "chunks": n_chunks,
+        "sample_rows": len(sample),
+        **search_info,
+        "trees": len(model.estimators_),
+        "test": confusion.evaluate("rf-stroke", ["0", "1"]),
+        "artifacts": _save(model, preprocessor, out_dir, derived),
+    }
+
+
+def export_derived(model, preprocessor, out_dir):
+    from inference.forest_engine import ENGINE_DIR, ForestEngine, convert_forest
+    from inference.stroke_index import INDEX_DIR, build_index
+
+    artifacts = {"forest": os.path.join(out_dir, ENGINE_DIR)}
+    convert_forest(model, artifacts["forest"])
+    index_dir = os.path.join(out_dir, INDEX_DIR)
+    if os.path.exists(index_dir):
+        build_index(ForestEngine.load(artifacts["forest"]), preprocessor, index_dir)
+        artifacts["index"] = index_dir
+    return artifacts
@@ -0,0 +1,89 @@
+"""XGBoost trials on shared quantized fold matrices, with early stopping.
+
+Scoring XGBClassifier through cross_val_score rebuilds XGBoost's data matrix
+from the pandas frame in every fold of every trial, and always boosts all
+`n_estimators` rounds. `BoosterCV` builds hist-quantized QuantileDMatrix
+objects once per search worker. Each training fold is split into the rows
+the booster trains on and an inner holdout of `holdout_size`; the holdout
+and the validation fold are binned against the training rows. Every trial
+then calls `xgb.train` on those matrices and stops once the holdout's log
+loss has not improved for `early_stopping_rounds` rounds. The trial scores
+accuracy on the validation fold, which played no part in choosing when to
+stop, at the best iteration, as XGBClassifier.score would. The refitted
+model gets the trial's mean best round count as `n_estimators`.
+"""
+import numpy as np
+
+from training.search import CrossValidation, params_key
+
+EARLY_STOPPING_ROUNDS = 50
+MAX_BIN = 256
+# Share of each training fold held out to decide when to stop boosting
+HOLDOUT_SIZE = 0.2
+
+
+def _rows(data, index):
+    return data.iloc[index] if hasattr(data, "iloc") else data[index]
+
+
+class BoosterCV(CrossValidation):
+    def __init__(self, early_stopping_rounds=EARLY_STOPPING_ROUNDS, max_bin=MAX_BIN, holdout_size=HOLDOUT_SIZE,
+                 random_state=0):
+        self.early_stopping_rounds = early_stopping_rounds
+        self.max_bin = max_bin
+        self.holdout_size = holdout_size
+        self.random_state = random_state
+
+    def prepare(self, estimator, X, y, cv, scoring):
+        import xgboost as xgb
+        from sklearn.model_selection import check_cv, train_test_split
+
+        if scoring is not None:
+            raise ValueError("BoosterCV scores accuracy only")
+        self.estimator = estimator
+        self._folds = []
+        for train, valid in check_cv(cv, y, classifier=True).split(X, y):
+            # Early stopping watches the inner holdout, so the validation fold's score is not tuned on it
+            train, holdout = train_test_split(train, test_size=self.holdout_size, random_state=self.random_state,
+                                              stratify=np.asarray(_rows(y, train)))
+            dtrain = xgb.QuantileDMatrix(_rows(X, train), label=_rows(y, train), max_bin=self.max_bin)
+            dholdout = xgb.QuantileDMatrix(_rows(X, holdout), label=_rows(y, holdout), ref=dtrain)
+            dvalid = xgb.QuantileDMatrix(_rows(X, valid), label=_rows(y, valid), ref=dtrain)
+            self._folds.append((dtrain, dholdout, dvalid, np.asarray(_rows(y, valid))))
+        self._rounds = {}
+
+    def _booster_params(self, params):
+        from sklearn.base import clone
+
+        model = clone(self.estimator).set_params(**params)
+        booster_params = {name: value for name, value in model.get_xgb_params().items() if value is not None}
+        # The matrices are already binned; the booster has to agree on the bin count
+        booster_params.update(max_bin=self.max_bin, tree_method="hist")
+        booster_params.setdefault("eval_metric", "logloss")
+        return booster_params, model.n_estimators or 100
+
+    def scores(self, params):
+        import xgboost as xgb
+
+        booster_params, max_rounds = self._booster_params(params)
+        scores, rounds = [], []
+        for dtrain, dholdout, dvalid, y_valid in self._folds:
+            booster = xgb.train(booster_params, dtrain, num_boost_round=max_rounds, evals=[(dholdout, "holdout")],
+                                early_stopping_rounds=self.early_stopping_rounds, verbose_eval=False)
+            best_rounds = booster.best_iteration + 1
+            probabilities = booster.predict(dvalid, iteration_range=(0, best_rounds))
+            scores.append(float(np.mean((probabilities > 0.5) == y_valid)))
+            rounds.append(best_rounds)
+        self._rounds[params_key(params)] = rounds
+        return scores
+
+    def refit_params(self, params):
+        key = params_key(params)
+        if key not in self._rounds:
+            # Reused from the trial store, or scored in another worker
+            self.scores(params)
+        return {**params, "n_estimators": int(round(np.mean(self._rounds[key])))}
+
+    def __repr__(self):
+        return (f"BoosterCV(early_stopping_rounds={self.early_stopping_rounds}, max_bin={self.max_bin}, "
+                f"holdout_size={self.holdout_size}, random_state={self.random_state})")
@@ -0,0 +1,204 @@
+"""Pneumonia CNN, as in ANN_ChestXRay.ipynb.
+
+Images are decoded with `inference.xray_preprocess`, the same code the app
+runs, so training and serving see identical pixels. They are decoded once
+into memory-mapped caches (`training.xray_cache`) under the cache directory,
+so epochs and tuner trials do not decode JPEGs again. The training split gets
+the notebook's ImageDataGenerator augmentation, applied a batch at a time by
+`training.xray_augment`. Unless `--learning-rate` is given, keras-tuner's
+Bayesian optimization chooses the learning rate, dense width and dropout,
+optionally across parallel worker processes (`training.xray_tune`). Writes
+`ANN_ChestXRay_model.h5` and, unless disabled, regenerates any TFLite
+conversions already present in the output directory.
+"""
+import os
+
+import numpy as np
+from tensorflow import keras
+
+from inference.xray_preprocess import DECODE_WORKERS, IMAGE_SHAPE
+from inference.xray_tflite import KERAS_FILE, STUDENT_FILE, TFLITE_FILES, convert
+from training.common import evaluate
+from training.xray_augment import BatchAffineAugmentation
+from training.xray_cache import BatchLoader, XrayCache
+
+# ImageDataGenerator settings of the training split; the test split is only rescaled
+AUGMENTATION = {
+    "rotation_range": 20,
+    "width_shift_range": 0.2,
+    "height_shift_range": 0.2,
+    "shear_range": 0.2,
+    "zoom_range": 0.2,
+    "horizontal_flip": True,
+}
+# keras-tuner search space; the notebook tuned the learning rate only, with a 512-unit dense layer and 0.5 dropout
+LEARNING_RATES = [1e-2, 1e-3, 1e-4]
+DENSE_UNITS = [128, 256, 512]
+DROPOUT_RATES = [0.3, 0.4, 0.5]
+BATCH_SIZE = 32
+EPOCHS = 3
+MAX_TRIALS = 3
+# Student: channel multiplier on the teacher's 32/64/128 filters, softmax temperature and hard-label weight
+STUDENT_WIDTH = 0.5
+TEMPERATURE = 4.0
+HARD_LABEL_WEIGHT = 0.1
+STUDENT_LEARNING_RATE = 1e-3
+
+
+def _loaders(train_dir, test_dir, cache_dir, seed, workers, transform):
+    """Training and test `BatchLoader`s over the memory-mapped caches, built on first use."""
+    train_cache = XrayCache.open(train_dir, cache_dir, workers)
+    test_cache = XrayCache.open(test_dir, cache_dir, workers)
+    train_batches = BatchLoader(train_cache, BATCH_SIZE, shuffle=True, seed=seed, transform=transform)
+    # Not shuffled, so predictions line up with the labels for evaluation
+    test_batches = BatchLoader(test_cache, BATCH_SIZE, shuffle=False)
+    # As in the notebook: an epoch covers twice the minority class
+    steps_per_epoch = max(int(train_cache.class_counts().min()) * 2 // BATCH_SIZE, 1)
+    return train_batches, test_batches, steps_per_epoch
+
+
+def _predict(model, batches):
+    return np.concatenate([np.asarray(model.predict_on_batch(x)).reshape(-1) for x, _ in batches.epoch()])
+
+
+def build_model(learning_rate, dense_units=512, dropout=0.5):
+    model = keras.Sequential([
+        keras.Input(shape=IMAGE_SHAPE),
+        keras.layers.Conv2D(32, (3, 3), activation="relu"),
+        keras.layers.MaxPooling2D(2, 2),
+        keras.layers.Conv2D(64, (3, 3), activation="relu"),
+        keras.layers.MaxPooling2D(2, 2),
+        keras.layers.Conv2D(128, (3, 3), activation="relu"),
+        keras.layers.MaxPooling2D(2, 2),
+        keras.layers.Flatten(),
+        keras.layers.Dense(dense_units, activation="relu"),
+        keras.layers.Dropout(dropout),
+        keras.layers.Dense(1, activation="sigmoid"),
+    ])
+    model.compile(optimizer=keras.optimizers.Adam(learning_rate=learning_rate),
+                  loss="binary_crossentropy", metrics=["accuracy"])
+    return model
+
+
+def _channels(filters, width):
+    return max(8, int(round(filters * width)))
+
+
+def build_student(width=STUDENT_WIDTH):
+    """Compact CNN: separable convolutions and global pooling instead of Flatten into Dense(512).
+
+    Returns (model, logits_model): the shipped model ends in a sigmoid like
+    the teacher; `logits_model` shares its layers and stops before it, for
+    the distillation loss.
+    """
+    inputs = keras.Input(shape=IMAGE_SHAPE)
+    x = keras.layers.Conv2D(_channels(32, width), (3, 3), activation="relu")(inputs)
+    x = keras.layers.MaxPooling2D(2, 2)(x)
+    x = keras.layers.SeparableConv2D(_channels(64, width), (3, 3), activation="relu")(x)
+    x = keras.layers.MaxPooling2D(2, 2)(x)
+    x = keras.layers.SeparableConv2D(_channels(128, width), (3, 3), activation="relu")(x)
+    x = keras.layers.MaxPooling2D(2, 2)(x)
+    x = keras.layers.SeparableConv2D(_channels(256, width), (3, 3), activation="relu")(x)
+    x = keras.layers.GlobalAveragePooling2D()(x)
+    x = keras.layers.Dropout(0.3)(x)
+    logits = keras.layers.Dense(1)(x)
+    outputs = keras.layers.Activation("sigmoid")(logits)
+    return keras.Model(inputs, outputs, name="xray_student"), keras.Model(inputs, logits)
+
+
+def distillation_loss(temperature=TEMPERATURE, hard_label_weight=HARD_LABEL_WEIGHT):
+    """Hinton-style loss for one sigmoid output; `y_true` holds [label, teacher logit] per image."""
+    def loss(y_true, logits):
+        labels, teacher_logits = y_true[:, :1], y_true[:, 1:]
+        hard = keras.losses.binary_crossentropy(labels, logits, from_logits=True)
+        soft = keras.losses.binary_crossentropy(keras.ops.sigmoid(teacher_logits / temperature),
+                                                logits / temperature, from_logits=True)
+        # temperature ** 2 keeps the soft term's gradients on the hard term's scale
+        return hard_label_weight * hard + (1 - hard_label_weight) * temperature ** 2 * soft
+    return loss
+
+
+def _with_teacher_logits(batches, teacher):
+    """Targets become [label, teacher logit], the teacher seeing the same augmented images."""
+    for x, labels in batches:
+        probabilities = np.clip(np.asarray(teacher.predict_on_batch(x)).reshape(-1), 1e-7, 1 - 1e-7)
+        teacher_logits = np.log(probabilities) - np.log1p(-probabilities)
+        yield x, np.stack([labels, teacher_logits], axis=1).astype(np.float32)
+
+
+def distill(train_dir, test_dir, out_dir, cache_dir, width=STUDENT_WIDTH, temperature=TEMPERATURE,
+            hard_label_weight=HARD_LABEL_WEIGHT, epochs=EPOCHS, seed=42, workers=DECODE_WORKERS, compare=True):
+    """Train `build_student(width)` on the soft outputs of the CNN in out_dir and write `STUDENT_FILE` beside it."""
+    keras.utils.set_random_seed(seed)
+    teacher = keras.models.load_model(os.path.join(out_dir, KERAS_FILE))
+    train_batches, test_batches, steps_per_epoch = _loaders(
+        train_dir, test_dir, cache_dir, seed, workers, BatchAffineAugmentation(**AUGMENTATION))
+
+    model, logits_model = build_student(width)
+    logits_model.compile(optimizer=keras.optimizers.Adam(learning_rate=STUDENT_LEARNING_RATE),
+                         loss=distillation_loss(temperature, hard_label_weight))
+    logits_model.fit(_with_teacher_logits(train_batches.repeat(), teacher), steps_per_epoch=steps_per_epoch,
+                     epochs=epochs)
+
+    student_path = os.path.join(out_dir, STUDENT_FILE)
+    temp_path = student_path[:-len(".h5")] + ".tmp.h5"
+    model.save(temp_path)
+    os.replace(temp_path, student_path)
+
+    probabilities = _predict(model, test_batches)
+    report = {
+        "width": width,
+        "params": model.count_params(),
+        "teacher_params": teacher.count_params(),
+        "test": evaluate("cnn-xray student", test_batches.labels, (probabilities > 0.5).astype(int),
+                         ["Normal", "Pneumonia"]),
+        "artifacts": {"student": student_path},
+    }
+    if compare:
+        from inference.xray_tflite import _print_table
+        from inference.xray_tflite import report as backend_report
+
+        report["comparison"] = backend_report(test_dir, out_dir, backends=("keras", "student"))
+        _print_table(report["comparison"])
+    return report
+
+
+def build_tuned_model(hp):
+    return build_model(hp.Choice("learning_rate", values=LEARNING_RATES),
+                       hp.Choice("dense_units", values=DENSE_UNITS),
+                       hp.Choice("dropout", values=DROPOUT_RATES))
+
+
+def train(train_dir, test_dir, out_dir, cache_dir, learning_rate=None, epochs=EPOCHS, max_trials=MAX_TRIALS,
+          seed=42, workers=DECODE_WORKERS, tuner_workers=1, derived=True):
+    keras.utils.set_random_seed(seed)
+    train_batches, test_batches, steps_per_epoch = _loaders(
+        train_dir, test_dir, cache_dir, seed, workers, BatchAffineAugmentation(**AUGMENTATION))
+
+    if learning_rate is None:
+        from training.xray_tune import tune
+
+        hyperparameters, model = tune(train_dir, test_dir, cache_dir, max_trials, epochs, seed, workers,
+                                      tuner_workers)
+    else:
+        hyperparameters = {"learning_rate": learning_rate}
+        model = build_model(learning_rate)
+        model.fit(train_batches.repeat(), steps_per_epoch=steps_per_epoch, validation_data=test_batches.repeat(),
+                  validation_steps=len(test_batches), epochs=epochs)
+
+    model_path = os.path.join(out_dir, KERAS_FILE)
+    temp_path = model_path[:-len(".h5")] + ".tmp.h5"
+    model.save(temp_path)
+    os.replace(temp_path, model_path)
+    artifacts = {"model": model_path}
+    if derived and any(os.path.exists(os.path.join(out_dir, file_name)) for file_name in TFLITE_FILES.values()):
+        artifacts.update(convert(model_path, train_dir, out_dir))
+
+    probabilities = _predict(model, test_batches)
+    return {
+        "learning_rate": hyperparameters["learning_rate"],
+        "hyperparameters": hyperparameters,
+        "steps_per_epoch": steps_per_epoch,
+        "test": evaluate("cnn-xray", test_batches.labels, (probabilities > 0.5).astype(int), ["Normal", "Pneumonia"]),
+        "artifacts": artifacts,
+    }
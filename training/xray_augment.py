@@ -0,0 +1,164 @@
+"""Batched affine augmentation, equivalent to the notebook's ImageDataGenerator.
+
+`ImageDataGenerator.random_transform` augments one image at a time: it draws
+the parameters, builds a 3x3 matrix, and runs scipy's affine_transform once
+per channel. `BatchAffineAugmentation` draws the same parameters from the
+same distributions for a whole batch at once:
+
+- rotation: uniform in +-rotation_range degrees
+- shifts: uniform in +-range times the image size
+- shear: uniform in +-shear_range degrees
+- zoom: independent uniform x and y factors in [1 - zoom_range, 1 + zoom_range]
+- horizontal flip: with probability 1/2
+
+It composes the matrices in the same order, around the same pixel centre,
+folds the flip into them, and warps the whole batch with one call to
+TensorFlow's ImageProjectiveTransformV3 kernel. Bilinear interpolation with
+edge pixels replicated matches scipy's order=1, mode="nearest". As a
+`BatchLoader` transform, it runs on the loader's background thread.
+
+    python -m training.xray_augment    # check against ImageDataGenerator, then benchmark
+"""
+import sys
+import time
+
+import numpy as np
+
+
+class BatchAffineAugmentation:
+    def __init__(self, rotation_range=0.0, width_shift_range=0.0, height_shift_range=0.0, shear_range=0.0,
+                 zoom_range=0.0, horizontal_flip=False):
+        self.rotation_range = rotation_range
+        self.width_shift_range = width_shift_range
+        self.height_shift_range = height_shift_range
+        self.shear_range = shear_range
+        # A float means [1 - zoom_range, 1 + zoom_range], as in ImageDataGenerator
+        self.zoom_range = (1 - zoom_range, 1 + zoom_range) if np.isscalar(zoom_range) else tuple(zoom_range)
+        self.horizontal_flip = horizontal_flip
+
+    def sample(self, n, shape, random):
+        """Parameters for n images of (height, width), keyed like ImageDataGenerator's transform parameters."""
+        height, width = shape[:2]
+
+        def uniform(low, high):
+            return random.uniform(low, high, n) if high > low else np.full(n, float(low))
+
+        # Fractional shifts are relative to the image size, as in ImageDataGenerator
+        tx = uniform(-self.height_shift_range, self.height_shift_range)
+        ty = uniform(-self.width_shift_range, self.width_shift_range)
+        return {
+            "theta": uniform(-self.rotation_range, self.rotation_range),
+            "tx": tx * height if self.height_shift_range < 1 else tx,
+            "ty": ty * width if self.width_shift_range < 1 else ty,
+            "shear": uniform(-self.shear_range, self.shear_range),
+            "zx": uniform(*self.zoom_range),
+            "zy": uniform(*self.zoom_range),
+            "flip_horizontal": (random.random(n) < 0.5) & bool(self.horizontal_flip),
+        }
+
+    @staticmethod
+    def matrices(params, shape):
+        """(n, 2, 3) affine maps from output (row, col) to input (row, col), as apply_affine_transform builds them."""
+        height, width = shape[:2]
+        theta, shear = np.deg2rad(params["theta"]), np.deg2rad(params["shear"])
+        n = len(theta)
+        zeros, ones = np.zeros(n), np.ones(n)
+
+        def stack(rows):
+            return np.stack([np.stack(row, axis=-1) for row in rows], axis=-2)
+
+        rotation = stack([[np.cos(theta), -np.sin(theta), zeros], [np.sin(theta), np.cos(theta), zeros],
+                          [zeros, zeros, ones]])
+        shift = stack([[ones, zeros, params["tx"]], [zeros, ones, params["ty"]], [zeros, zeros, ones]])
+        shear_matrix = stack([[ones, -np.sin(shear), zeros], [zeros, np.cos(shear), zeros], [zeros, zeros, ones]])
+        zoom = stack([[params["zx"], zeros, zeros], [zeros, params["zy"], zeros], [zeros, zeros, ones]])
+        matrix = rotation @ shift @ shear_matrix @ zoom
+
+        # transform_matrix_offset_center: rotate and zoom about the pixel centre
+        o_x, o_y = height / 2 - 0.5, width / 2 - 0.5
+        offset = np.array([[1, 0, o_x], [0, 1, o_y], [0, 0, 1]])
+        reset = np.array([[1, 0, -o_x], [0, 1, -o_y], [0, 0, 1]])
+        matrix = offset @ matrix @ reset
+        # Keras builds the matrix in (x, y) = (col, row) terms and swaps both axes before the warp
+        matrix = matrix[:, [1, 0, 2]][:, :, [1, 0, 2]]
+        return matrix[:, :2]
+
+    @staticmethod
+    def warp(x, matrices):
+        """Bilinear warp of a (n, h, w, c) float32 batch in one op, replicating edge pixels."""
+        import tensorflow as tf
+
+        n, height, width, _ = x.shape
+        # ImageProjectiveTransformV3 maps output (x, y) = (col, row) to input (col, row)
+        transforms = np.stack([matrices[:, 1, 1], matrices[:, 1, 0], matrices[:, 1, 2],
+                               matrices[:, 0, 1], matrices[:, 0, 0], matrices[:, 0, 2],
+                               np.zeros(n), np.zeros(n)], axis=1).astype(np.float32)
+        return tf.raw_ops.ImageProjectiveTransformV3(
+            images=x, transforms=transforms, output_shape=[height, width], fill_value=0.0,
+            interpolation="BILINEAR", fill_mode="NEAREST").numpy()
+
+    def apply(self, x, params):
+        matrices = self.matrices(params, x.shape[1:])
+        # Flipping after the warp is the same as reading column w - 1 - col: fold it into the matrix
+        flip = np.asarray(params["flip_horizontal"], dtype=bool)
+        width = x.shape[2]
+        matrices[flip, :, 2] += (width - 1) * matrices[flip, :, 1]
+        matrices[flip, :, 1] *= -1
+        return self.warp(x, matrices)
+
+    def __call__(self, x, random):
+        """`training.xray_cache.BatchLoader` transform."""
+        return self.apply(x, self.sample(len(x), x.shape[1:], random))
+
+
+def verify(samples=16, seed=0):
+    """Largest pixel difference from ImageDataGenerator.apply_transform under identical parameters."""
+    from tensorflow.keras.preprocessing.image import ImageDataGenerator
+
+    from training.xray import AUGMENTATION
+
+    random = np.random.default_rng(seed)
+    x = random.random((samples, 150, 150, 3)).astype(np.float32)
+    augmentation = BatchAffineAugmentation(**AUGMENTATION)
+    params = augmentation.sample(samples, x.shape[1:], random)
+    batched = augmentation.apply(x, params)
+    generator = ImageDataGenerator(**AUGMENTATION)
+    worst = 0.0
+    for row in range(samples):
+        expected = generator.apply_transform(x[row], {name: values[row] for name, values in params.items()})
+        worst = max(worst, float(np.max(np.abs(expected - batched[row]))))
+    return worst
+
+
+def benchmark(batches=20, batch_size=32, seed=0):
+    """Images per second: ImageDataGenerator.random_transform per image vs one batched warp."""
+    from tensorflow.keras.preprocessing.image import ImageDataGenerator
+
+    from training.xray import AUGMENTATION
+
+    random = np.random.default_rng(seed)
+    x = random.random((batch_size, 150, 150, 3)).astype(np.float32)
+    generator = ImageDataGenerator(**AUGMENTATION)
+    augmentation = BatchAffineAugmentation(**AUGMENTATION)
+    results = {}
+    for name, transform in (
+        ("ImageDataGenerator", lambda batch: np.stack([generator.random_transform(image) for image in batch])),
+        ("BatchAffineAugmentation", lambda batch: augmentation(batch, random)),
+    ):
+        transform(x)
+        start = time.perf_counter()
+        for _ in range(batches):
+            transform(x)
+        results[name] = batches * batch_size / (time.perf_counter() - start)
+    return results
+
+
+def main():
+    print(f"max abs difference vs ImageDataGenerator.apply_transform: {verify():.2e}")
+    for name, rate in benchmark().items():
+        print(f"{name}: {rate:.0f} images/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
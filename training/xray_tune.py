@@ -0,0 +1,150 @@
+"""keras-tuner search for the pneumonia CNN, optionally across local worker processes.
+
+With one tuner worker the search runs in this process, one trial after
+another, as the notebook's did. With more, `tune` uses keras-tuner's
+distributed mode. It starts a chief process that owns the Bayesian oracle and
+serves it over gRPC on a free local port. It then starts `tuner_workers`
+worker processes that each ask the chief for a trial, train it and report
+back, until `max_trials` are done. The roles come from the environment
+variables keras-tuner reads: KERASTUNER_TUNER_ID, KERASTUNER_ORACLE_IP and
+KERASTUNER_ORACLE_PORT. Distributed mode also needs grpcio installed.
+
+The cores are split between the workers: each gets an intra-op thread quota of
+cpu_count // tuner_workers, so concurrent trials do not oversubscribe the CPU.
+Every trial stops once validation loss has not improved for `PATIENCE` epochs.
+keras-tuner checkpoints each trial's best epoch, and the best model is loaded
+from its checkpoint afterwards instead of being retrained.
+
+    python -m training cnn-xray --train-dir chest_xray/train --test-dir chest_xray/test --tuner-workers 4
+"""
+import os
+import shutil
+import socket
+import subprocess
+import sys
+
+PROJECT_NAME = "ANN_best_model"
+PATIENCE = 2
+ORACLE_IP = "127.0.0.1"
+# The chief polls every 20 s for its workers to deregister before exiting
+CHIEF_TIMEOUT = 60
+
+
+def thread_quota(tuner_workers, cpus=None):
+    """Intra-op threads per worker so `tuner_workers` concurrent trials share the cores."""
+    return max(1, (cpus or os.cpu_count() or 1) // tuner_workers)
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((ORACLE_IP, 0))
+        return sock.getsockname()[1]
+
+
+def make_tuner(directory, max_trials, seed):
+    """The BayesianOptimization tuner; every process of a search builds the same one."""
+    import keras_tuner as kt
+
+    from training.xray import build_tuned_model
+
+    # Never overwrite: in distributed mode that would delete the chief's and other workers' trials
+    return kt.BayesianOptimization(build_tuned_model, objective="val_accuracy", max_trials=max_trials,
+                                   executions_per_trial=1, seed=seed, overwrite=False, directory=directory,
+                                   project_name=PROJECT_NAME)
+
+
+def _search(tuner, train_dir, test_dir, cache_dir, epochs, seed, workers):
+    from tensorflow import keras
+
+    from training.xray import AUGMENTATION, _loaders
+    from training.xray_augment import BatchAffineAugmentation
+
+    keras.utils.set_random_seed(seed)
+    train_batches, test_batches, steps_per_epoch = _loaders(
+        train_dir, test_dir, cache_dir, seed, workers, BatchAffineAugmentation(**AUGMENTATION))
+    tuner.search(train_batches.repeat(), steps_per_epoch=steps_per_epoch, validation_data=test_batches.repeat(),
+                 validation_steps=len(test_batches), epochs=epochs,
+                 callbacks=[keras.callbacks.EarlyStopping(monitor="val_loss", patience=PATIENCE)])
+
+
+def _launch(role, args, port, threads):
+    env = dict(os.environ, KERASTUNER_TUNER_ID=role, KERASTUNER_ORACLE_IP=ORACLE_IP,
+               KERASTUNER_ORACLE_PORT=str(port), OMP_NUM_THREADS=str(threads))
+    # The workers import `training` the same way this process did, from wherever it is run
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [root, env.get("PYTHONPATH")]))
+    return subprocess.Popen([sys.executable, "-m", "training.xray_tune", *args, "--threads", str(threads)], env=env)
+
+
+def _run_distributed(train_dir, test_dir, cache_dir, directory, max_trials, epochs, seed, tuner_workers, threads):
+    args = [train_dir, test_dir, "--cache-dir", cache_dir, "--directory", directory, "--max-trials", str(max_trials),
+            "--epochs", str(epochs), "--seed", str(seed)]
+    port = _free_port()
+    chief = _launch("chief", args, port, 1)
+    # Each worker seeds its own augmentation stream, so concurrent trials do not see identical batches
+    workers = [_launch(f"tuner{index}", args[:-1] + [str(seed + index)], port, threads)
+               for index in range(tuner_workers)]
+    try:
+        failed = [worker.args for worker in workers if worker.wait() != 0]
+        if failed:
+            raise RuntimeError(f"keras-tuner workers failed: {failed}")
+        try:
+            chief.wait(timeout=CHIEF_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            # Every trial is already saved to disk by the time the workers exit
+            pass
+    finally:
+        for process in [chief] + workers:
+            if process.poll() is None:
+                process.terminate()
+                process.wait()
+
+
+def tune(train_dir, test_dir, cache_dir, max_trials, epochs, seed, workers, tuner_workers=1):
+    """Run the search; returns (best hyperparameter values, best model loaded from its checkpoint)."""
+    from training.xray_cache import XrayCache
+
+    directory = os.path.join(cache_dir, "keras_tuner")
+    shutil.rmtree(os.path.join(directory, PROJECT_NAME), ignore_errors=True)
+    if tuner_workers <= 1:
+        tuner = make_tuner(directory, max_trials, seed)
+        _search(tuner, train_dir, test_dir, cache_dir, epochs, seed, workers)
+    else:
+        # Build the caches once, here, rather than racing to build them in every worker
+        for image_dir in (train_dir, test_dir):
+            XrayCache.open(image_dir, cache_dir, workers)
+        _run_distributed(train_dir, test_dir, cache_dir, directory, max_trials, epochs, seed, tuner_workers,
+                         thread_quota(tuner_workers))
+        # Reloads the oracle state and trials the chief and the workers wrote
+        tuner = make_tuner(directory, max_trials, seed)
+    return tuner.get_best_hyperparameters(num_trials=1)[0].values, tuner.get_best_models(num_models=1)[0]
+
+
+def main(argv=None):
+    """A chief or worker process of a distributed search; the role comes from KERASTUNER_TUNER_ID."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="One process of a distributed keras-tuner search (see `tune`).")
+    parser.add_argument("train_dir")
+    parser.add_argument("test_dir")
+    parser.add_argument("--cache-dir", required=True)
+    parser.add_argument("--directory", required=True)
+    parser.add_argument("--max-trials", type=int, required=True)
+    parser.add_argument("--epochs", type=int, required=True)
+    parser.add_argument("--seed", type=int, required=True)
+    parser.add_argument("--threads", type=int, default=1, help="intra-op thread quota")
+    args = parser.parse_args(argv)
+
+    import tensorflow as tf
+
+    # Must happen before TensorFlow runs its first op
+    tf.config.threading.set_intra_op_parallelism_threads(args.threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    tuner = make_tuner(args.directory, args.max_trials, args.seed)
+    # The chief serves the oracle until the workers are done; workers run trials
+    _search(tuner, args.train_dir, args.test_dir, args.cache_dir, args.epochs, args.seed, workers=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())